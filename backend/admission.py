@@ -0,0 +1,197 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from metrics import timed
+
+# --------- Config controle de admissão ----------
+# Requisições de /api/process em processamento ao mesmo tempo (por worker); o
+# resto espera numa fila por classe. "interactive" (um texto colado, corpo
+# pequeno) passa na frente de "bulk" (uploads de arquivos), que nunca ocupa
+# mais que ADMISSION_BULK_SLOTS vagas: sobra espaço para o interativo.
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "16"))
+ADMISSION_BULK_SLOTS = int(os.getenv("ADMISSION_BULK_SLOTS", "2"))  # serve.py: núcleos por worker
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "64"))  # requisições em fila, por classe
+# Espera estimada (ou real) acima disso devolve 429 com Retry-After na hora
+ADMISSION_MAX_WAIT_INTERACTIVE = float(os.getenv("ADMISSION_MAX_WAIT_INTERACTIVE", "1"))
+ADMISSION_MAX_WAIT_BULK = float(os.getenv("ADMISSION_MAX_WAIT_BULK", "15"))
+# Upload de arquivo (parte multipart com filename=) é sempre bulk; fora isso,
+# corpo até esse tamanho (Content-Length) é interativo. Acima dele a classe sai
+# só do cabeçalho, para recusar antes de ler o corpo
+ADMISSION_INTERACTIVE_BYTES = int(os.getenv("ADMISSION_INTERACTIVE_BYTES", str(128 * 1024)))
+EWMA_ALPHA = 0.2
+
+CLASSES = ("interactive", "bulk")
+
+
+class Overloaded(HTTPException):
+    def __init__(self, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=429,
+            detail=f"Servidor sobrecarregado. Tente novamente em {seconds} s.",
+            headers={"Retry-After": str(seconds)},
+        )
+
+
+async def request_class(request) -> str:
+    """
+    "bulk" para multipart com alguma parte de arquivo (filename=), qualquer
+    que seja o tamanho; "interactive" para o resto até ADMISSION_INTERACTIVE_BYTES.
+    Corpo maior (ou sem Content-Length) é bulk sem ler nada; o corpo pequeno é
+    lido aqui (fica em cache no Request para o parse do form).
+    """
+    content_length = request.headers.get("content-length")
+    if not (content_length and content_length.isdigit() and int(content_length) <= ADMISSION_INTERACTIVE_BYTES):
+        return "bulk"
+    content_type = request.headers.get("content-type", "")
+    if content_type.lower().startswith("multipart/") and has_file_part(await request.body(), content_type):
+        return "bulk"
+    return "interactive"
+
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+
+
+def has_file_part(body: bytes, content_type: str) -> bool:
+    """Se algum cabeçalho de parte do multipart traz filename= (upload de arquivo)."""
+    match = _BOUNDARY_RE.search(content_type)
+    if not match:
+        return False
+    for part in body.split(b"--" + match.group(1).encode("latin-1"))[1:]:
+        headers, _, _ = part.partition(b"\r\n\r\n")
+        if b"filename" in headers.lower():
+            return True
+    return False
+
+
+class AdmissionController:
+    """
+    Semáforo com duas filas de prioridade. Ao liberar uma vaga, a fila
+    interativa é atendida primeiro; bulk só entra abaixo de bulk_slots.
+    A espera de quem chega é estimada pela média móvel (EWMA) do tempo de
+    serviço da classe x a posição na fila: passando de max_wait, ou com a fila
+    cheia, a requisição é recusada (Overloaded) sem ocupar memória nem CPU.
+    Com shed=False (itens de /api/process/bulk) ninguém é recusado: o item
+    espera a vaga e a espera vira backpressure na leitura do stream.
+    """
+
+    def __init__(self, concurrency: int = ADMISSION_CONCURRENCY, bulk_slots: int = ADMISSION_BULK_SLOTS,
+                 max_queue: int = ADMISSION_QUEUE, max_wait: dict = None):
+        self.concurrency = max(1, concurrency)
+        self.capacity = {"interactive": self.concurrency, "bulk": max(1, min(bulk_slots, self.concurrency))}
+        self.max_queue = max_queue
+        self.max_wait = max_wait or {"interactive": ADMISSION_MAX_WAIT_INTERACTIVE, "bulk": ADMISSION_MAX_WAIT_BULK}
+        self.active = Counter()
+        self._queues = {kind: deque() for kind in CLASSES}  # futures à espera de vaga
+        self.service_time = {kind: None for kind in CLASSES}  # EWMA em segundos
+        self.admitted = Counter()
+        self.shed = Counter()  # (classe, motivo) -> recusadas
+
+    def _has_slot(self, kind: str) -> bool:
+        return sum(self.active.values()) < self.concurrency and self.active[kind] < self.capacity[kind]
+
+    def estimated_wait(self, kind: str) -> float:
+        """Segundos até uma nova requisição de kind ganhar vaga (0 sem histórico)."""
+        if self._has_slot(kind) and not self._queues[kind]:
+            return 0.0
+        service = self.service_time[kind] or 0.0
+        ahead = len(self._queues[kind])
+        if kind == "bulk":
+            ahead += len(self._queues["interactive"])  # o interativo sempre passa na frente
+        return (ahead // self.capacity[kind] + 1) * service
+
+    def _reject(self, kind: str, reason: str, retry_after: float):
+        self.shed[(kind, reason)] += 1
+        raise Overloaded(retry_after)
+
+    def _dispatch(self):
+        """Entrega vagas livres às filas, interativa primeiro."""
+        for kind in CLASSES:
+            queue = self._queues[kind]
+            while queue and self._has_slot(kind):
+                future = queue.popleft()
+                if not future.done():  # quem desistiu (timeout/desconexão) já saiu
+                    self.active[kind] += 1
+                    future.set_result(None)
+
+    async def _acquire(self, kind: str, shed: bool = True):
+        if self._has_slot(kind) and not self._queues[kind]:
+            self.active[kind] += 1
+            return
+        queue = self._queues[kind]
+        if shed and len(queue) >= self.max_queue:
+            self._reject(kind, "queue_full", self.estimated_wait(kind) or self.max_wait[kind])
+        estimate = self.estimated_wait(kind)
+        if shed and estimate > self.max_wait[kind]:
+            self._reject(kind, "wait_estimate", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        try:
+            with timed("admission_wait"):
+                await asyncio.wait_for(asyncio.shield(future), self.max_wait[kind] if shed else None)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._abandon(kind, future)
+                self._reject(kind, "wait_timeout", self.estimated_wait(kind) or self.max_wait[kind])
+            # vaga concedida no mesmo instante do timeout: segue com ela
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(kind)  # o cliente desistiu depois de ganhar a vaga
+            else:
+                self._abandon(kind, future)
+            raise
+
+    def _abandon(self, kind: str, future):
+        future.cancel()
+        try:
+            self._queues[kind].remove(future)
+        except ValueError:
+            pass
+
+    def _release(self, kind: str):
+        self.active[kind] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, kind: str, shed: bool = True):
+        """Ocupa uma vaga de kind durante o bloco (ou Overloaded, se shed)."""
+        await self._acquire(kind, shed)
+        self.admitted[kind] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if shed:  # a EWMA estima o tempo de uma requisição, não de um item do stream
+                elapsed = time.perf_counter() - started
+                previous = self.service_time[kind]
+                self.service_time[kind] = elapsed if previous is None else previous + EWMA_ALPHA * (elapsed - previous)
+            self._release(kind)
+
+    def queue_depth(self, kind: str) -> int:
+        return len(self._queues[kind])
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "classes": {
+                kind: {
+                    "active": self.active[kind],
+                    "queued": self.queue_depth(kind),
+                    "capacity": self.capacity[kind],
+                    "max_wait": self.max_wait[kind],
+                    "admitted": self.admitted[kind],
+                    "service_ms": round(self.service_time[kind] * 1000, 1) if self.service_time[kind] else None,
+                    "estimated_wait": round(self.estimated_wait(kind), 3),
+                    "shed": {reason: n for (k, reason), n in self.shed.items() if k == kind},
+                }
+                for kind in CLASSES
+            },
+        }
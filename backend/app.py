@@ -251,112 +251,274 @@
 
 #     return results
 
+import asyncio
 import os
-import re
-from io import BytesIO
-from typing import List, Optional, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
-import httpx
-from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException
+import anyio.to_thread
+
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pdfminer.high_level import extract_text as pdf_extract
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+# request.form() devolve o UploadFile do Starlette (base do UploadFile do FastAPI)
+from starlette.datastructures import UploadFile
+from starlette.background import BackgroundTask
 
 # Local ML (fallback)
-from nlp import classify as local_classify
-from templates import PRODUCTIVE_REPLY, NON_PRODUCTIVE_REPLY
-
-# --------- Config HF (opcional) ----------
-USE_HF_ENV = os.getenv("USE_HF") == "1"
-HF_TOKEN = os.getenv("HF_TOKEN", "").strip()
-USE_HF = bool(USE_HF_ENV and HF_TOKEN)  # só ativa HF se houver token
-
-HF_HEADERS = {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else {}
-HF_ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
-HF_T2T_MODEL = "google/flan-t5-base"  # para gerar resposta curta em PT-BR
-
-# --------- Regras de negócio (saudações/boas festas) ----------
-HOLIDAY_PATTERNS = [
-    r"\bfeliz\s+natal\b",
-    r"\bboas\s+festas\b",
-    r"\bfeliz\s+ano\s+novo\b",
-    r"\bbo[mn]\s+natal\b",
-    r"\bmerry\s+christmas\b",
-    r"\bhappy\s+new\s+year\b",
-]
-
-def is_holiday_greeting(text: str) -> bool:
-    t = (text or "").lower()
-    t = re.sub(r"\s+", " ", t)
-    return any(re.search(p, t, flags=re.IGNORECASE) for p in HOLIDAY_PATTERNS)
-
-
-def hf_zero_shot_productive(text: str):
-    """Zero-shot (BART-MNLI) com fallback local."""
-    url = f"https://api-inference.huggingface.co/models/{HF_ZERO_SHOT_MODEL}"
-    payload = {
-        "inputs": text,
-        "parameters": {"candidate_labels": ["Produtivo", "Improdutivo"], "multi_label": False},
-    }
-    try:
-        r = httpx.post(url, headers=HF_HEADERS, json=payload, timeout=45)
-        r.raise_for_status()
-        data = r.json()
-        label = data["labels"][0]
-        score = float(data["scores"][0])
-        return label, score
-    except Exception as e:
-        print(f"[HF zero-shot] erro: {e}", flush=True)
-        return local_classify(text)
-
-
-def hf_generate_reply(category: str, email_text: str) -> str:
-    """Gera resposta breve em PT-BR (FLAN-T5) com fallback."""
-    url = f"https://api-inference.huggingface.co/models/{HF_T2T_MODEL}"
-    prompt = (
-        "Você é um assistente de suporte ao cliente de uma empresa financeira.\n"
-        f"Categoria do email: {category}\n"
-        "Objetivo: redigir uma resposta breve, educada e clara em português do Brasil.\n"
-        "- Se for Produtivo: confirme recebimento, explique próximo passo e prazo curto.\n"
-        "- Se for Improdutivo: agradeça e informe que não é necessária ação.\n\n"
-        f"Email do cliente:\n\"{email_text}\"\n\n"
-        "Resposta:"
-    )
-    try:
-        r = httpx.post(
-            url,
-            headers=HF_HEADERS,
-            json={"inputs": prompt, "parameters": {"max_new_tokens": 120, "temperature": 0.2}},
-            timeout=60,
-        )
-        r.raise_for_status()
-        data = r.json()
-        text = (data[0].get("generated_text") or "").strip()
-        if text:
-            return text
-    except Exception as e:
-        print(f"[HF generate] erro: {e}", flush=True)
+from nlp import (
+    MODEL_BACKEND, MODEL_POLL_SECONDS, MODEL_VERSION, classify_batch as local_classify_batch,
+    get_model as load_local_model, model_revision,
+    reload_model as reload_local_model,
+)
+from replies import TEMPLATES_FINGERPRINT, ReplyEngine, extract_slots, retarget
+from pdf import extract_pdf, pool_stats as pdf_pool_stats, shutdown_pool as shutdown_pdf_pool
+from hf import (
+    USE_HF, HF_ZERO_SHOT_MODEL, HF_T2T_MODEL,
+    hf_zero_shot_productive, hf_zero_shot_batch, hf_generate_reply, close_client as close_hf_client,
+    remote_stats,
+)
+from onnx_model import (
+    USE_ONNX, ONNX_MODEL_FILE, classify_batch as onnx_classify_batch, load_session as load_onnx_session,
+)
+from cache import ResultCache
+from batcher import MicroBatcher
+from cascade import CASCADE_THRESHOLD, USE_CASCADE, Cascade
+from chunking import CHUNK_EARLY_EXIT_REMOTE, Chunker
+from neardup import NEARDUP_ENABLED, NearDuplicateIndex, cluster, simhash_many
+from feedback import FEEDBACK_TOKEN, FeedbackError, FeedbackStore, FeedbackTrainer, check_token, parse_feedback
+from executor import CLASSIFY_EXECUTOR, CLASSIFY_WORKERS, run_cpu, shutdown_executor
+from ingest import archive_kind, iter_upload_messages
+from metrics import debug, debug_enabled, logger, render as render_metrics, sample_request, timed
+from uploads import MAX_FILE_BYTES, MAX_TEXT_CHARS, PROCESS_MAX_FILES, parse_form, read_text_upload
+from bulk import BULK_MAX_FILES, BULK_MAX_REQUEST_BYTES, NDJSONStreamingResponse, iter_ndjson, stream_results
+from rules import RuleEngine, load_rules
+from resilience import current_budget, start_budget
+from admission import AdmissionController, request_class
+
+# --------- Modo de classificação ----------
+# CASCADE (local, escala para HF) > HF (remoto) > ONNX (transformer local) > LOCAL (ComplementNB)
+MODE = "CASCADE" if USE_CASCADE else "HF" if USE_HF else "ONNX" if USE_ONNX else "LOCAL"
+
+# --------- Regras de negócio (saudações, fora do escritório, notificações) ----------
+# Todas as regras de rules.json (ou RULES_PATH) compiladas numa única regex.
+rule_engine = RuleEngine(load_rules())
+
+# --------- Cascata (MODE == "CASCADE") ----------
+# Regiões sinalizadas (seção "escalate" de rules.json) sempre vão para o HF;
+# o resto só quando a confiança local fica abaixo do limiar (CASCADE_THRESHOLD
+# ou o calibrado no artefato do modelo).
+flag_engine = RuleEngine(load_rules(section="escalate"))
+cascade = Cascade(flag_engine)
+
+
+# --------- Cache de resultados ----------
+# Namespace = modo + versão dos modelos + regras: mudar qualquer um invalida o cache.
+CACHE_NAMESPACE = {
+    "CASCADE": f"CASCADE:nlp-{MODEL_BACKEND}-v{MODEL_VERSION}:{HF_ZERO_SHOT_MODEL}:{HF_T2T_MODEL}"
+               f":t{CASCADE_THRESHOLD or 'model'}:flags-{flag_engine.fingerprint}",
+    "HF": f"HF:{HF_ZERO_SHOT_MODEL}:{HF_T2T_MODEL}",
+    "ONNX": f"ONNX:{ONNX_MODEL_FILE}",
+    "LOCAL": f"LOCAL:nlp-{MODEL_BACKEND}-v{MODEL_VERSION}",
+}[MODE] + f":rules-{rule_engine.fingerprint}:replies-{TEMPLATES_FINGERPRINT}"
+result_cache = ResultCache(CACHE_NAMESPACE)
+
+# --------- Respostas sugeridas ----------
+# Templates com slots (protocolo, prazo, anexos) extraídos do email; no modo HF
+# as respostas geradas ficam num cache semântico e o FLAN-T5 só roda no miss.
+reply_engine = ReplyEngine(f"HF:{HF_T2T_MODEL}")
+
+# --------- Micro-batching do classificador local ----------
+# Requisições concorrentes (mesmo de um email só) viram uma única chamada ao
+# modelo: predict_proba do NB ou session.run do ONNX, no pool de executor.py.
+local_batcher = MicroBatcher(onnx_classify_batch if MODE == "ONNX" else local_classify_batch)
+
+
+# --------- Quase-duplicatas ----------
+# A mesma notificação com outro protocolo/data cai na mesma assinatura SimHash:
+# reaproveita a decisão já tomada (ver neardup.py), com os slots da resposta trocados.
+near_index = NearDuplicateIndex()
+
+
+# --------- Feedback e troca do modelo a quente ----------
+# Correções dos operadores (/api/feedback) alimentam um treino incremental em
+# segundo plano; a revisão publicada é trocada sem reiniciar (ver nlp.reload_model).
+feedback_store = FeedbackStore()
+trainer = FeedbackTrainer(feedback_store)
+_feedback_event = None  # acorda o watcher logo após uma correção
+
+
+def apply_model_revision(revision: int):
+    """Decisões guardadas são do modelo anterior: namespace novo no cache e índice limpo."""
+    if MODE in ("LOCAL", "CASCADE"):
+        result_cache.namespace = f"{CACHE_NAMESPACE}:r{revision}" if revision else CACHE_NAMESPACE
+        near_index.clear()
+
+
+async def watch_model():
+    applied = model_revision()
+    while True:
+        try:
+            await asyncio.wait_for(_feedback_event.wait(), MODEL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _feedback_event.clear()
+        try:
+            if await asyncio.to_thread(trainer.pending):
+                await asyncio.to_thread(trainer.train)
+            await asyncio.to_thread(reload_local_model)
+        except Exception as e:
+            logger.warning("Falha no treino/troca do modelo: %s", e)
+        revision = model_revision()
+        if revision != applied:
+            apply_model_revision(revision)
+            applied = revision
 
-    return PRODUCTIVE_REPLY if category == "Produtivo" else NON_PRODUCTIVE_REPLY
 
+def reuse_decision(decision, source_slots: dict, text: str):
+    """Decisão de um email quase idêntico, com a sugestão adaptada aos slots de text."""
+    label, conf, suggestion = decision[:3]
+    suggestion = retarget(suggestion, source_slots, extract_slots(text))
+    return label, conf, suggestion if suggestion is not None else reply_for(label, text)
+
+
+# --------- Documentos longos ----------
+# Textos maiores que CHUNK_CHARS são classificados por janelas (ver chunking.py).
+chunker = Chunker()
 
-def decide_and_suggest(text: str):
-    """
-    Curto-circuito para saudações; depois HF (se ativo) ou classificador local.
-    """
-    if is_holiday_greeting(text):
-        return "Improdutivo", 0.95, NON_PRODUCTIVE_REPLY
 
-    if USE_HF:
-        label, conf = hf_zero_shot_productive(text)
-        suggestion = hf_generate_reply(label, text)
-        return label, conf, suggestion
+def reply_for(category: str, text: str) -> str:
+    return reply_engine.render(category, text)
 
-    label, conf = local_classify(text)
-    suggestion = PRODUCTIVE_REPLY if label == "Produtivo" else NON_PRODUCTIVE_REPLY
+
+async def decide_remote(text: str):
+    """Zero-shot + resposta gerada na HF (com os fallbacks locais de hf.py)."""
+    if chunker.is_long(text):
+        # o FLAN-T5 recebe só a janela decisiva, não o documento inteiro
+        try:
+            label, conf, window = await chunker.classify(text, hf_zero_shot_batch, CHUNK_EARLY_EXIT_REMOTE)
+        except Exception:
+            # alguma janela sem resposta da HF: o documento todo vai para o modelo local
+            label, conf, window = await chunker.classify(text, local_batcher.submit_many)
+    else:
+        (label, conf), window = await hf_zero_shot_productive(text), None
+    suggestion = await reply_engine.suggest(label, text, hf_generate_reply, prompt_text=window)
     return label, conf, suggestion
 
 
+async def decide_and_suggest(text: str):
+    """Decisão de um texto só: o caminho de lote (cache, regras, MODE) com um item."""
+    [decision] = await decide_and_suggest_batch([text])
+    return decision
+
+
+async def decide_and_suggest_batch(texts: List[str]):
+    """
+    Mesma decisão de decide_and_suggest para uma lista de textos: o precheck roda
+    uma vez para o lote, o classificador local também, e as chamadas à HF (modo
+    HF ou escaladas pela cascata) vão em paralelo. Textos já vistos (ou repetidos
+    no próprio lote) saem do cache; quase-duplicatas de um email já decidido
+    saem do índice SimHash, e as do próprio lote seguem o representante do grupo.
+    Só os primeiros MAX_TEXT_CHARS caracteres de cada texto chegam ao modelo.
+    """
+    texts = [text[:MAX_TEXT_CHARS] for text in texts]
+    decisions = [None] * len(texts)
+    keys = [result_cache.key(text) for text in texts]
+    first_by_key = {}
+    unseen: List[int] = []
+    pending: List[int] = []
+    remote: List[int] = []
+
+    for i in range(len(texts)):
+        first_by_key.setdefault(keys[i], i)
+    cached = await result_cache.get_many(list(first_by_key))
+    for (key, i), value in zip(first_by_key.items(), cached):
+        if value is not None:
+            decisions[i] = value
+        else:
+            unseen.append(i)
+    fresh = list(unseen)  # decididos agora: vão para o cache no fim
+
+    members = {}  # índice -> representante do grupo no lote
+    signatures = {}
+    if NEARDUP_ENABLED and unseen:
+        signatures = dict(zip(unseen, await run_cpu(simhash_many, [texts[i] for i in unseen])))
+        groups = cluster([signatures[i] for i in unseen])
+        representatives = []
+        for pos, i in enumerate(unseen):
+            rep = unseen[groups[pos]]
+            if rep != i:
+                members[i] = rep
+                continue
+            known = near_index.get(signatures[i])
+            if known is not None:
+                decisions[i] = reuse_decision(known, known[3], texts[i])
+            else:
+                representatives.append(i)
+        near_index.grouped += len(members)
+        unseen = representatives
+
+    # regras de todos os textos novos numa única ida ao pool
+    with timed("rule_precheck"):
+        rules = await run_cpu(rule_engine.find_many, [texts[i] for i in unseen]) if unseen else []
+    for i, rule in zip(unseen, rules):
+        if rule is not None:
+            rule_engine.record(rule)
+            decisions[i] = (rule.category, rule.confidence, reply_for(rule.category, texts[i]))
+        elif MODE == "HF":
+            remote.append(i)
+        else:
+            pending.append(i)
+
+    # textos curtos num único submit; os longos por janelas (que caem no mesmo micro-batch)
+    short = [i for i in pending if not chunker.is_long(texts[i])]
+    long_docs = [i for i in pending if chunker.is_long(texts[i])]
+    batch, *chunked = await asyncio.gather(
+        local_batcher.submit_many([texts[i] for i in short]),
+        *(chunker.classify(texts[i], local_batcher.submit_many) for i in long_docs),
+    )
+    local = dict(zip(short, batch))
+    local.update((i, (label, conf)) for i, (label, conf, _) in zip(long_docs, chunked))
+
+    if MODE == "CASCADE" and local:
+        # regiões sinalizadas de todo o lote numa ida ao pool; decisão local ou escalada
+        order = list(local)
+        flags = await run_cpu(flag_engine.find_many, [texts[i] for i in order])
+        for i, flag in zip(order, flags):
+            reason = cascade.route(local[i][1], flag)
+            if reason is not None:
+                debug("Escalando para HF (%s)", reason)
+                del local[i]
+                remote.append(i)
+
+    for i, (label, conf) in local.items():
+        decisions[i] = (label, conf, reply_for(label, texts[i]))
+
+    if remote:
+        answers = await asyncio.gather(*(decide_remote(texts[i]) for i in remote))
+        for i, decision in zip(remote, answers):
+            decisions[i] = decision
+
+    # respostas remotas de uma requisição que caiu em fallback (erro, circuito
+    # aberto, orçamento esgotado) não são guardadas: a HF decide quando voltar
+    budget = current_budget()
+    degraded = set(remote) if budget is not None and budget.degraded else set()
+    for i in unseen:
+        if i not in degraded:
+            near_index.put(signatures.get(i), (*decisions[i], extract_slots(texts[i])))
+    for i, rep in members.items():
+        decisions[i] = reuse_decision(decisions[rep], extract_slots(texts[rep]), texts[i])
+        if rep in degraded:
+            degraded.add(i)
+
+    result_cache.put_many([(keys[i], decisions[i]) for i in fresh if i not in degraded])
+    for i, key in enumerate(keys):
+        decisions[i] = decisions[first_by_key[key]]
+
+    return decisions
+
+
 # --------- FastAPI App ----------
 app = FastAPI(title="Email Classifier API", openapi_version="3.0.2")
 
@@ -370,16 +532,170 @@ app.add_middleware(
 )
 
 
-def read_txt_bytes(b: bytes) -> str:
+# Threads por worker para I/O bloqueante (to_thread do asyncio e do Starlette);
+# vazio = padrões das bibliotecas. serve.py deriva o valor dos núcleos.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "0"))
+
+
+# --------- Prontidão ----------
+# O modelo carrega em segundo plano depois que o servidor sobe: /api/health
+# responde de imediato (processo vivo) e /api/ready só depois do carregamento.
+warmup = {"ready": False, "seconds": None, "error": None}
+_warmup_task = None
+_watch_task = None
+
+
+def load_models():
+    if MODE == "ONNX":
+        load_onnx_session()
+    else:
+        load_local_model()  # no modo HF o local é o fallback
+
+
+async def warm_up():
+    global _watch_task
+    started = time.perf_counter()
     try:
-        return b.decode("utf-8", errors="ignore")
-    except Exception:
-        return b.decode("latin-1", errors="ignore")
+        await asyncio.to_thread(load_models)
+    except Exception as e:
+        warmup["error"] = str(e)
+        logger.warning("Falha ao carregar o modelo: %s", e)
+        return
+    warmup["seconds"] = round(time.perf_counter() - started, 3)
+    warmup["ready"] = True
+    # o ONNX não é retreinado: as correções só ficam gravadas
+    if MODE != "ONNX" and MODEL_POLL_SECONDS > 0:
+        apply_model_revision(model_revision())
+        _watch_task = asyncio.ensure_future(watch_model())
+
+
+@app.on_event("startup")
+async def startup():
+    global _warmup_task, _feedback_event
+    if THREADPOOL_SIZE:
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(THREADPOOL_SIZE))
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    _feedback_event = asyncio.Event()
+    _warmup_task = asyncio.ensure_future(warm_up())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await result_cache.flush()
+    shutdown_pdf_pool()
+    shutdown_executor()
+    await close_hf_client()
+
+
+FILE_FIELDS = ['files', 'file', 'emailFiles', 'upload', 'documents']
+
+
+def collect_upload_files(form) -> List[UploadFile]:
+    """Arquivos enviados em qualquer um dos campos aceitos (todos os valores de cada campo)."""
+    files_found = []
+    for field_name in FILE_FIELDS:
+        if field_name in form:
+            debug("Campo '%s' encontrado", field_name)
+            for item in form.getlist(field_name):
+                if isinstance(item, UploadFile):
+                    files_found.append(item)
+                    debug("Arquivo em '%s': %s", field_name, item.filename)
+    return files_found
+
+
+def error_result(source: str, error: str) -> dict:
+    return {
+        "source": source,
+        "error": error,
+        "category": None,
+        "confidence": 0,
+        "suggestion": None
+    }
+
+
+async def read_upload_text(file: UploadFile):
+    """Extrai o texto de um upload. Devolve (texto, None) ou (None, mensagem de erro)."""
+    try:
+        debug("Processando arquivo: %s", file.filename)
+
+        if file.size == 0:
+            return None, "Arquivo vazio"
+
+        filename = (file.filename or "").lower()
+        content_type = (file.content_type or "").lower()
+        debug("Content-type: %s", content_type)
+
+        # Extração de texto baseada no tipo de arquivo
+        if filename.endswith(".pdf") or content_type == "application/pdf":
+            try:
+                # PDF vai para disco e é lido no pool de processos (pdf.py)
+                debug("Extraindo texto do PDF...")
+                content = await extract_pdf(file)
+                if not content or not content.strip():
+                    raise ValueError("PDF sem texto extraível")
+                debug("Texto extraído: %d caracteres", len(content))
+            except Exception as e:
+                logger.warning("Erro PDF em %s: %s", file.filename, e)
+                return None, f"Erro ao processar PDF: {str(e)}"
+        else:
+            # Arquivo de texto
+            debug("Processando como texto...")
+            with timed("file_read"):
+                content = await read_text_upload(file)
+            debug("Texto lido: %d caracteres", len(content))
+
+        # Verifica se há conteúdo para classificar
+        if not content or not content.strip():
+            return None, "Arquivo sem conteúdo de texto"
+        return content.strip(), None
+
+    except Exception as e:
+        logger.warning("Erro geral ao processar %s: %s", file.filename, e)
+        return None, f"Erro interno: {str(e)}"
+
+
+async def iter_upload_texts(file: UploadFile):
+    """
+    (source, texto, erro) por email contido no upload: um para .txt/.pdf,
+    vários para .eml/.mbox/.zip (ver ingest.py), lidos em streaming.
+    """
+    if getattr(file, "oversized", False):
+        yield file.filename, None, f"Arquivo maior que o limite de {MAX_FILE_BYTES} bytes"
+        return
+    kind = archive_kind(file.filename, file.content_type)
+    if kind is None:
+        content, error = await read_upload_text(file)
+        yield file.filename, content, error
+        return
+    if file.size == 0:
+        yield file.filename, None, "Arquivo vazio"
+        return
+    async for item in iter_upload_messages(file, kind):
+        yield item
+
+
+# Arquivos de um mesmo upload lidos/extraídos ao mesmo tempo (PDFs em paralelo no pool)
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+
+
+async def read_upload_files(files: List[UploadFile]):
+    """
+    Lista de (source, texto, erro) de todos os arquivos, extraídos em paralelo
+    (no máximo UPLOAD_CONCURRENCY por vez), na ordem em que foram enviados.
+    """
+    limit = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def read_one(file):
+        async with limit:
+            return [item async for item in iter_upload_texts(file)]
+
+    per_file = await asyncio.gather(*(read_one(file) for file in files))
+    return [item for items in per_file for item in items]
 
 
 @app.get("/", response_class=HTMLResponse)
 def root():
-    mode = "HF" if USE_HF else "LOCAL"
+    mode = MODE
     return f"""
     <html>
       <head><title>Email Classifier API</title></head>
@@ -388,6 +704,8 @@ def root():
         <p>API online ✅ — Modo: <strong>{mode}</strong></p>
         <ul>
           <li><a href="/api/health">/api/health</a></li>
+          <li><a href="/api/ready">/api/ready</a></li>
+          <li><a href="/metrics">/metrics</a></li>
           <li><a href="/docs">/docs</a> (Swagger)</li>
         </ul>
       </body>
@@ -397,85 +715,113 @@ def root():
 
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "mode": "HF" if USE_HF else "LOCAL"}
+    return {
+        "status": "ok",
+        "mode": MODE,
+        "ready": warmup["ready"],
+        "model": {
+            "backend": MODEL_BACKEND,
+            "version": MODEL_VERSION,
+            "revision": model_revision(),
+            "feedback": trainer.stats(),
+        },
+        "cache": result_cache.stats(),
+        "rules": rule_engine.stats(),
+        "batcher": local_batcher.stats(),
+        "executor": {"kind": CLASSIFY_EXECUTOR, "workers": CLASSIFY_WORKERS},
+        "chunking": chunker.stats(),
+        "neardup": near_index.stats(),
+        "cascade": {**cascade.stats(), "flags": flag_engine.stats()} if MODE == "CASCADE" else None,
+        "remote": remote_stats() if MODE in ("HF", "CASCADE") else None,
+        "admission": admission.stats(),
+        "replies": reply_engine.stats(),
+    }
 
 
-@app.post("/api/process")
-async def process_emails(
-    request: Request,
-    files: Union[UploadFile, List[UploadFile], None] = File(default=None),
-    text: Optional[str] = Form(default=None),
-):
-    results: List[dict] = []
+@app.get("/api/ready")
+def ready():
+    """Readiness: 200 só com o modelo carregado (503 enquanto carrega ou se falhou)."""
+    if not warmup["ready"]:
+        return JSONResponse({"status": "loading" if warmup["error"] is None else "error", **warmup}, status_code=503)
+    return {"status": "ready", "mode": MODE, **warmup}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # gauges: valor do momento; counters: totais acumulados desde o início do worker
+    cache_stats = result_cache.stats()
+    gauges = {"email_classifier_cache_size": cache_stats["size"]}
+    counters = {
+        f"email_classifier_cache_{name}_total": cache_stats[name]
+        for name in ("hits", "disk_hits", "misses", "disk_writes", "disk_evictions")
+    }
+    gauges["email_classifier_ready"] = int(warmup["ready"])
+    gauges["email_classifier_model_revision"] = model_revision()
+    counters["email_classifier_feedback_accepted_total"] = feedback_store.accepted
+    counters["email_classifier_feedback_train_rounds_total"] = trainer.rounds
+    counters["email_classifier_batcher_batches_total"] = local_batcher.batches
+    counters["email_classifier_batcher_items_total"] = local_batcher.items
+    if MODE == "CASCADE":
+        for tier, count in cascade.tiers.items():
+            counters[f'email_classifier_cascade_decisions_total{{tier="{tier}"}}'] = count
+        for reason, count in cascade.reasons.items():
+            counters[f'email_classifier_cascade_escalations_total{{reason="{reason}"}}'] = count
+        gauges["email_classifier_cascade_escalation_rate"] = cascade.escalation_rate()
+    if MODE in ("HF", "CASCADE"):
+        remote = remote_stats()
+        for kind, breaker in remote["breakers"].items():
+            gauges[f'email_classifier_hf_breaker_open{{model="{kind}"}}'] = int(breaker["state"] != "closed")
+            counters[f'email_classifier_hf_breaker_short_circuits_total{{model="{kind}"}}'] = breaker["short_circuits"]
+        counters["email_classifier_hf_deadline_exceeded_total"] = remote["deadline"]["exceeded"]
+        counters["email_classifier_hf_degraded_requests_total"] = remote["deadline"]["degraded"]
+        counters["email_classifier_hf_hedges_sent_total"] = remote["hedge"]["sent"]
+        counters["email_classifier_hf_hedges_won_total"] = remote["hedge"]["won"]
+    for kind in ("interactive", "bulk"):
+        gauges[f'email_classifier_admission_queue_depth{{class="{kind}"}}'] = admission.queue_depth(kind)
+        gauges[f'email_classifier_admission_active{{class="{kind}"}}'] = admission.active[kind]
+        counters[f'email_classifier_admission_admitted_total{{class="{kind}"}}'] = admission.admitted[kind]
+    for (kind, reason), count in admission.shed.items():
+        counters[f'email_classifier_admission_shed_total{{class="{kind}",reason="{reason}"}}'] = count
+    for name in ("hits", "grouped", "evictions"):
+        counters[f"email_classifier_neardup_{name}_total"] = getattr(near_index, name)
+    for name in ("documents", "chunks", "early_exits"):
+        counters[f"email_classifier_chunking_{name}_total"] = getattr(chunker, name)
+    for name in ("hits", "misses", "generated"):
+        counters[f"email_classifier_reply_cache_{name}_total"] = getattr(reply_engine, name)
+    counters["email_classifier_pdf_timeouts_total"] = pdf_pool_stats["timeouts"]
+    counters["email_classifier_pdf_pool_restarts_total"] = pdf_pool_stats["restarts"]
+    for rule_name, count in rule_engine.fired.items():
+        counters[f'email_classifier_rule_fired_total{{rule="{rule_name}"}}'] = count
+    return PlainTextResponse(render_metrics(gauges, counters), media_type="text/plain; version=0.0.4")
+
+
+# --------- Controle de admissão ----------
+# Fila com prioridade na frente de /api/process: texto colado passa na frente de
+# uploads, e com espera estimada acima do limite a resposta é 429 + Retry-After.
+admission = AdmissionController()
+
 
-    # Debug logs
-    print(f"[DEBUG] text recebido: {bool(text and text.strip())}")
-    print(f"[DEBUG] files recebido: {files}")
-    print(f"[DEBUG] tipo de files: {type(files)}")
-
-    # --- Processamento de texto ---
-    if text and text.strip():
-        print("[DEBUG] Processando texto...")
-        label, conf, suggestion = decide_and_suggest(text.strip())
-        results.append({
-            "source": "input_text",
-            "category": label,
-            "confidence": conf,
-            "suggestion": suggestion
-        })
-        return results
-
-    # --- Processamento de arquivos ---
-    files_list = []
-    
-    # Tenta múltiplas abordagens para capturar arquivos
-    if files:
-        print(f"[DEBUG] files não é None, tipo: {type(files)}")
-        if isinstance(files, UploadFile):
-            files_list = [files]
-            print(f"[DEBUG] Arquivo único: {files.filename}")
-        elif isinstance(files, list):
-            files_list = files
-            print(f"[DEBUG] Lista de arquivos: {[f.filename if f else 'None' for f in files]}")
-    
-    # Se não funcionou pela forma padrão, tenta pelo form manual
-    if not files_list:
-        print("[DEBUG] Tentando capturar arquivos via form...")
-        try:
-            form = await request.form()
-            print(f"[DEBUG] Form keys: {list(form.keys())}")
-            
-            # Tenta diferentes variações do nome do campo
-            for field_name in ['files', 'files[]', 'file']:
-                if field_name in form:
-                    field_value = form.getlist(field_name) if hasattr(form, 'getlist') else [form[field_name]]
-                    for item in field_value:
-                        if isinstance(item, UploadFile):
-                            files_list.append(item)
-                            print(f"[DEBUG] Arquivo encontrado via {field_name}: {item.filename}")
-        except Exception as e:
-            print(f"[DEBUG] Erro ao processar form: {e}")
-    
-    if files_list:
-        print(f"[DEBUG] Total de arquivos para processar: {len(files_list)}")
-        
-        # Filtra arquivos válidos
-        valid_files = []
-        for f in files_list:
-            if f and hasattr(f, 'filename') and f.filename and f.filename.strip():
-                valid_files.append(f)
-                print(f"[DEBUG] Arquivo válido: {f.filename}")
-            else:
-                print(f"[DEBUG] Arquivo inválido: {f}")
 @app.post("/api/process")
 async def process_emails(request: Request):
+    sample_request()
+    # recusa (429) antes de processar (corpo grande nem é lido); a vaga fica ocupada até a resposta
+    async with admission.admit(await request_class(request)):
+        start_budget()  # prazo de ponta a ponta das chamadas à HF desta requisição
+        return await process_form(request)
+
+
+async def process_form(request: Request):
     results: List[dict] = []
+    form = None
 
     try:
-        # Captura o form completo manualmente
-        form = await request.form()
-        print(f"[DEBUG] Form keys disponíveis: {list(form.keys())}")
-        print(f"[DEBUG] Content-Type: {request.headers.get('content-type')}")
+        # Captura o form completo manualmente (com limites de bytes, ver uploads.py);
+        # lotes maiores que PROCESS_MAX_FILES vão para /api/process/bulk
+        with timed("form_parse"):
+            form = await parse_form(request, max_files=PROCESS_MAX_FILES)
+        if debug_enabled():  # a lista de campos só é montada se o log vai sair
+            debug("Form keys disponíveis: %s", list(form.keys()))
+            debug("Content-Type: %s", request.headers.get('content-type'))
 
         # Verifica se há texto
         text_value = None
@@ -485,8 +831,8 @@ async def process_emails(request: Request):
                 break
         
         if text_value and str(text_value).strip():
-            print(f"[DEBUG] Processando texto de campo '{key}'")
-            label, conf, suggestion = decide_and_suggest(str(text_value).strip())
+            debug("Processando texto de campo '%s'", key)
+            [(label, conf, suggestion)] = await decide_and_suggest_batch([str(text_value).strip()])
             results.append({
                 "source": "input_text",
                 "category": label,
@@ -495,121 +841,127 @@ async def process_emails(request: Request):
             })
             return results
 
-        # Verifica se há arquivos em qualquer campo possível
-        file_fields = ['files', 'file', 'emailFiles', 'upload', 'documents']
-        files_found = []
-        
-        for field_name in file_fields:
-            if field_name in form:
-                print(f"[DEBUG] Campo '{field_name}' encontrado")
-                field_value = form[field_name]
-                
-                if isinstance(field_value, UploadFile):
-                    files_found.append(field_value)
-                    print(f"[DEBUG] Arquivo único em '{field_name}': {field_value.filename}")
-                elif hasattr(form, 'getlist'):
-                    # FastAPI form pode ter getlist para múltiplos valores
-                    try:
-                        multiple_files = form.getlist(field_name)
-                        for item in multiple_files:
-                            if isinstance(item, UploadFile):
-                                files_found.append(item)
-                                print(f"[DEBUG] Arquivo múltiplo em '{field_name}': {item.filename}")
-                    except Exception as e:
-                        print(f"[DEBUG] Erro ao buscar múltiplos em '{field_name}': {e}")
-
-        print(f"[DEBUG] Total de arquivos encontrados: {len(files_found)}")
+        files_found = collect_upload_files(form)
+        debug("Total de arquivos encontrados: %d", len(files_found))
         
         if files_found:
-            # Processa os arquivos encontrados
-            for file in files_found:
-                try:
-                    print(f"[DEBUG] Processando arquivo: {file.filename}")
-                    
-                    # Lê o conteúdo do arquivo
-                    file_content = await file.read()
-                    print(f"[DEBUG] Tamanho do arquivo: {len(file_content)} bytes")
-                    
-                    if not file_content:
-                        results.append({
-                            "source": file.filename,
-                            "error": "Arquivo vazio",
-                            "category": None,
-                            "confidence": 0,
-                            "suggestion": None
-                        })
-                        continue
-
-                    filename = file.filename.lower()
-                    content_type = (file.content_type or "").lower()
-                    print(f"[DEBUG] Content-type: {content_type}")
-
-                    # Extração de texto baseada no tipo de arquivo
-                    if filename.endswith(".pdf") or content_type == "application/pdf":
-                        try:
-                            print("[DEBUG] Extraindo texto do PDF...")
-                            content = pdf_extract(BytesIO(file_content))
-                            if not content or not content.strip():
-                                raise ValueError("PDF sem texto extraível")
-                            print(f"[DEBUG] Texto extraído: {len(content)} caracteres")
-                        except Exception as e:
-                            print(f"[DEBUG] Erro PDF: {e}")
-                            results.append({
-                                "source": file.filename,
-                                "error": f"Erro ao processar PDF: {str(e)}",
-                                "category": None,
-                                "confidence": 0,
-                                "suggestion": None
-                            })
-                            continue
-                    else:
-                        # Arquivo de texto
-                        print("[DEBUG] Processando como texto...")
-                        content = read_txt_bytes(file_content)
-
-                    # Verifica se há conteúdo para classificar
-                    if not content or not content.strip():
-                        results.append({
-                            "source": file.filename,
-                            "error": "Arquivo sem conteúdo de texto",
-                            "category": None,
-                            "confidence": 0,
-                            "suggestion": None
-                        })
-                        continue
-
-                    print(f"[DEBUG] Classificando texto de {len(content)} chars...")
-                    # Classifica o conteúdo
-                    label, conf, suggestion = decide_and_suggest(content.strip())
-                    results.append({
-                        "source": file.filename,
+            # Extrai o texto de todos os arquivos (em paralelo) e classifica tudo num único lote;
+            # pending guarda (posição em results, texto) para preencher na ordem original.
+            pending = []
+            for source, content, error in await read_upload_files(files_found):
+                if error:
+                    results.append(error_result(source, error))
+                    continue
+                pending.append((len(results), content))
+                results.append({"source": source})
+
+            if pending:
+                debug("Classificando %d arquivo(s) em lote...", len(pending))
+                decisions = await decide_and_suggest_batch([content for _, content in pending])
+                for (pos, _), (label, conf, suggestion) in zip(pending, decisions):
+                    results[pos].update({
                         "category": label,
                         "confidence": conf,
                         "suggestion": suggestion
                     })
-                    print(f"[DEBUG] Resultado: {label} ({conf})")
-
-                except Exception as e:
-                    print(f"[DEBUG] Erro geral ao processar {file.filename}: {e}")
-                    results.append({
-                        "source": file.filename,
-                        "error": f"Erro interno: {str(e)}",
-                        "category": None,
-                        "confidence": 0,
-                        "suggestion": None
-                    })
 
             return results
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[DEBUG] Erro ao processar form: {e}")
+        logger.warning("Erro ao processar form: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno ao processar requisição: {str(e)}"
         )
+    finally:
+        if form is not None:
+            await form.close()
 
     # Se chegou até aqui, não há texto nem arquivos
     raise HTTPException(
         status_code=400,
         detail="Nenhum conteúdo encontrado. Envie texto ou arquivos válidos."
-    )
\ No newline at end of file
+    )
+
+
+@app.post("/api/feedback", status_code=202)
+async def submit_feedback(request: Request):
+    """
+    Correções de rótulo: {"text": ..., "label": "Produtivo"|"Improdutivo"} ou
+    {"items": [...]}. Grava e responde na hora; o treino roda em segundo plano.
+    Só para operadores: exige o cabeçalho X-Feedback-Token (FEEDBACK_TOKEN).
+    """
+    if not FEEDBACK_TOKEN:
+        raise HTTPException(status_code=503, detail="Feedback desativado (FEEDBACK_TOKEN não configurado).")
+    if not check_token(request.headers.get("x-feedback-token")):
+        raise HTTPException(status_code=401, detail="Token de operador inválido.")
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON inválido.")
+    try:
+        items = parse_feedback(payload)
+    except FeedbackError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    accepted = await asyncio.to_thread(
+        feedback_store.append, [(text[:MAX_TEXT_CHARS], label) for text, label in items]
+    )
+    if _feedback_event is not None:
+        _feedback_event.set()
+    return {"accepted": accepted, "revision": model_revision()}
+
+
+@app.post("/api/process/bulk")
+async def process_emails_bulk(request: Request):
+    """
+    Classificação em massa com resposta NDJSON (uma linha por email, assim que
+    fica pronta, com "index" na ordem de entrada). Aceita:
+    - application/x-ndjson: uma linha {"id": ..., "text": ...} por email, lida em streaming;
+    - multipart/form-data: arquivos nos mesmos campos de /api/process.
+    """
+    sample_request()
+    content_type = (request.headers.get("content-type") or "").lower()
+
+    if content_type.startswith("multipart/form-data"):
+        with timed("form_parse"):
+            form = await parse_form(request, max_files=BULK_MAX_FILES, max_request_bytes=BULK_MAX_REQUEST_BYTES)
+        files = collect_upload_files(form)
+        if not files:
+            raise HTTPException(status_code=400, detail="Nenhum arquivo encontrado no multipart.")
+
+        async def items():
+            # arquivos de caixa de email (.mbox/.zip) viram um item por mensagem
+            for file in files:
+                async for item in iter_upload_texts(file):
+                    yield item
+
+        async def close_form():
+            await form.close()
+
+        return NDJSONStreamingResponse(stream_results(items(), handle_item), background=BackgroundTask(close_form))
+
+    return NDJSONStreamingResponse(stream_results(iter_ndjson(request), handle_item))
+
+
+async def handle_item(index: int, item) -> dict:
+    source, text, error = item
+    if error:
+        return {"index": index, **error_result(source, error)}
+    return await classify_item(index, source, text)
+
+
+async def classify_item(index: int, source: str, text: str) -> dict:
+    # cada email ocupa uma vaga bulk: o interativo de /api/process passa na
+    # frente e o stream espera (sem 429 no meio) em vez de disputar o executor
+    async with admission.admit("bulk", shed=False):
+        start_budget()  # no bulk o prazo é por email (cada item roda na própria task)
+        [(label, conf, suggestion)] = await decide_and_suggest_batch([text])
+    return {
+        "index": index,
+        "source": source,
+        "category": label,
+        "confidence": conf,
+        "suggestion": suggestion
+    }
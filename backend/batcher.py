@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+from executor import run_cpu
+from metrics import timed
+
+# --------- Config micro-batching ----------
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+
+
+class MicroBatcher:
+    """
+    Junta textos de requisições concorrentes numa única chamada de fn(lista).
+    Um lote sai quando atinge max_batch_size ou quando o mais antigo espera
+    max_wait segundos; cada chamador recebe de volta só os seus resultados.
+    A fila vive no event loop (sem locks); fn roda via run (por padrão no pool
+    de executor.py), e vários lotes podem estar em execução ao mesmo tempo.
+    """
+
+    def __init__(self, fn, max_batch_size: int = BATCH_MAX_SIZE, max_wait: float = BATCH_MAX_WAIT_MS / 1000,
+                 run=run_cpu):
+        self.fn = fn
+        self.run = run
+        self._running = set()  # Tasks dos lotes em execução
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending = []  # (item, future)
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit_many(self, items):
+        items = list(items)
+        if not items:
+            return []
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            self._pending.append((item, future))
+            futures.append(future)
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await asyncio.gather(*futures)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        # chamadores cancelados não entram no lote
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch):
+        try:
+            with timed("local_classify"):
+                results = await self.run(self.fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "running": len(self._running),
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
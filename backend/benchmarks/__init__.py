@@ -0,0 +1,9 @@
+"""
+Benchmarks do classificador. Rodar de dentro de backend/, por exemplo:
+    python -m benchmarks --out bench.json        # suíte completa (JSON)
+    python -m benchmarks.preprocess              # tokenização, chars/s
+    python -m benchmarks.stages                  # regras, classify, PDF
+    python -m benchmarks.load --hf-mock          # carga ponta a ponta no app ASGI
+    python -m benchmarks.startup                 # import (-X importtime) e tempo até health/ready
+    python -m benchmarks.compare a.json b.json   # diff entre versões
+"""
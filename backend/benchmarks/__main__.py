@@ -0,0 +1,42 @@
+"""
+Suíte completa: partida, pré-processamento, estágios e carga ponta a ponta, num único JSON.
+
+    python -m benchmarks --out bench.json
+    python -m benchmarks.compare antes.json depois.json
+"""
+import argparse
+import json
+import time
+
+from benchmarks import load, preprocess, stages, startup
+from benchmarks.report import environment, peak_rss_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks do classificador.")
+    parser.add_argument("--out", default=None, help="grava o JSON neste arquivo (padrão: stdout)")
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hf-mock", action="store_true")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "startup": startup.run(repeat=3),
+        "preprocess": preprocess.run(repeat=3),
+        "stages": stages.run(n_emails=args.emails),
+        "load": load.run(args.requests, args.concurrency, hf_mock=args.hf_mock),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
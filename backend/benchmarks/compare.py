@@ -0,0 +1,39 @@
+"""
+Compara dois relatórios de `python -m benchmarks` métrica a métrica.
+
+    python -m benchmarks.compare antes.json depois.json
+"""
+import argparse
+import json
+
+
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, path + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dois relatórios de benchmark.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as fh:
+        before = dict(flatten(json.load(fh)))
+    with open(args.after, encoding="utf-8") as fh:
+        after = dict(flatten(json.load(fh)))
+
+    for path in sorted(before.keys() & after.keys()):
+        if path.startswith("environment."):
+            continue
+        old, new = before[path], after[path]
+        ratio = f"{new / old:6.2f}x" if old else "     -"
+        print(f"{path:60s} {old:>14,.3f} {new:>14,.3f} {ratio}")
+
+
+if __name__ == "__main__":
+    main()
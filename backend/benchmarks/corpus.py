@@ -0,0 +1,78 @@
+import random
+
+# Vocabulário sintético de emails em PT-BR (mistura produtivo/improdutivo, stopwords e ruído)
+WORDS = (
+    "preciso status solicitação chamado protocolo anexo comprovante boleto fatura "
+    "pagamento atualizar sistema erro acesso senha cadastro contrato prazo análise "
+    "arquivo recebimento confirmar segue favor urgente reembolso cobrança extrato "
+    "obrigado atenção parabéns feliz natal sucesso equipe trabalho ótimo abraço "
+    "de da do para com por que não uma um os as na no em ao pela pelo mais muito"
+).split()
+NOISE = ["1234", "R$ 1.250,00", "12/03/2024", "https://portal.exemplo.com.br/chamado?id=98765",
+         "www.exemplo.com.br", "nº 4471-9", "(11) 98765-4321", "--", "***", "fulano_silva@exemplo.com"]
+
+
+def synthetic_email(rng: random.Random, n_words: int = 80) -> str:
+    words = []
+    for _ in range(n_words):
+        words.append(rng.choice(NOISE) if rng.random() < 0.08 else rng.choice(WORDS))
+        if rng.random() < 0.1:
+            words[-1] += rng.choice([",", ".", "!", "?", ":"])
+    return " ".join(words)
+
+
+def synthetic_emails(n: int, n_words: int = 80, seed: int = 42):
+    rng = random.Random(seed)
+    return [synthetic_email(rng, n_words) for _ in range(n)]
+
+
+def synthetic_document(n_chars: int, seed: int = 42) -> str:
+    """Texto longo (ex.: extraído de PDF) com aproximadamente n_chars caracteres."""
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < n_chars:
+        part = synthetic_email(rng, 200)
+        parts.append(part)
+        total += len(part) + 1
+    return "\n".join(parts)[:n_chars]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(n_pages: int, lines_per_page: int = 40, seed: int = 42) -> bytes:
+    """PDF mínimo (Helvetica, texto latin-1) com n_pages páginas de emails sintéticos."""
+    rng = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages, preenchido depois
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for _ in range(n_pages):
+        ops = ["BT /F1 9 Tf 11 TL 40 800 Td"]
+        for _ in range(lines_per_page):
+            ops.append(f"({_pdf_escape(synthetic_email(rng, 14))}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        content_id = len(objects) + 2
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Contents {content_id} 0 R /Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+        objects.append(f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n_pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
@@ -0,0 +1,110 @@
+"""
+Gerador de carga ponta a ponta contra o app ASGI em processo (sem rede).
+
+    python -m benchmarks.load [--requests 200] [--concurrency 16] [--hf-mock]
+
+Cenários: texto único, upload de vários .txt e upload com PDF. Com --hf-mock o
+app roda em modo HF apontando para mock_hf.py, também em processo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+import pdf
+from benchmarks.corpus import synthetic_emails, synthetic_pdf
+from benchmarks.report import peak_rss_mb, summarize
+
+MOCK_HF_URL = "http://mock-hf"
+
+
+def load_app(hf_mock: bool):
+    """Importa o app; o modo HF é decidido no import, então o ambiente vem antes."""
+    if hf_mock:
+        os.environ.update({"USE_HF": "1", "HF_TOKEN": "bench", "HF_API_URL": MOCK_HF_URL})
+    import app
+    import hf
+
+    if hf_mock:
+        import mock_hf
+
+        hf._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_hf.app))
+    return app.app
+
+
+def scenarios(files_per_request: int, pdf_pages: int):
+    emails = synthetic_emails(1000, seed=7)
+    pdf_bytes = synthetic_pdf(pdf_pages)
+
+    def text(i):
+        return {"data": {"text": emails[i % len(emails)]}}
+
+    def txt_files(i):
+        return {"files": [
+            ("files", (f"email{j}.txt", emails[(i * files_per_request + j) % len(emails)].encode("utf-8")))
+            for j in range(files_per_request)
+        ]}
+
+    def with_pdf(i):
+        return {"files": [("files", ("doc.pdf", pdf_bytes)), ("files", ("email.txt", emails[i % len(emails)].encode()))]}
+
+    return {"text": text, f"files_{files_per_request}": txt_files, f"pdf_{pdf_pages}p": with_pdf}
+
+
+async def run_scenario(client, build, n_requests: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with limit:
+            t = time.perf_counter()
+            r = await client.post("/api/process", **build(i))
+            latencies.append(time.perf_counter() - t)
+            if r.status_code != 200:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    result = summarize(latencies, time.perf_counter() - t0)
+    result["errors"] = errors
+    return result
+
+
+async def run_async(n_requests: int, concurrency: int, files_per_request: int, pdf_pages: int, hf_mock: bool) -> dict:
+    asgi_app = load_app(hf_mock)
+    transport = httpx.ASGITransport(app=asgi_app)
+    report = {"mode": "HF-mock" if hf_mock else "LOCAL", "concurrency": concurrency}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # aquecimento: carrega o modelo e sobe o pool de PDF fora da medição
+        for build in scenarios(files_per_request, pdf_pages).values():
+            await client.post("/api/process", **build(0))
+        for name, build in scenarios(files_per_request, pdf_pages).items():
+            report[name] = await run_scenario(client, build, n_requests, concurrency)
+    # RUSAGE_CHILDREN só contabiliza processos já encerrados: fecha o pool de PDF antes
+    pdf.shutdown_pool(wait=True)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def run(n_requests: int = 200, concurrency: int = 16, files_per_request: int = 10,
+        pdf_pages: int = 5, hf_mock: bool = False) -> dict:
+    return asyncio.run(run_async(n_requests, concurrency, files_per_request, pdf_pages, hf_mock))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--files-per-request", type=int, default=10)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--hf-mock", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests, args.concurrency, args.files_per_request, args.pdf_pages, args.hf_mock), indent=2))
+
+
+if __name__ == "__main__":
+    main()
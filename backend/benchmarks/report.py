@@ -0,0 +1,50 @@
+import os
+import platform
+import resource
+import sys
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, wall: float = None, items: int = None) -> dict:
+    """p50/p95/p99/média em ms e vazão (itens/s) a partir de latências em segundos."""
+    values = sorted(latencies)
+    wall = wall if wall is not None else sum(values)
+    items = items if items is not None else len(values)
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "throughput_per_s": round(items / wall, 2) if wall else 0.0,
+    }
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def environment() -> dict:
+    import numpy
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "sklearn": sklearn.__version__,
+    }
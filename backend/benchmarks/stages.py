@@ -0,0 +1,86 @@
+"""
+Micro-benchmarks por estágio: regras (inclusive com centenas de regras
+sintéticas, para ver o custo crescer ou não), classificador local (1 a 1 e em
+lote) e extração de PDF.
+
+    python -m benchmarks.stages [--emails 2000] [--pdf-pages 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import nlp
+import pdf
+from rules import Rule, RuleEngine, load_rules
+from benchmarks.corpus import synthetic_emails, synthetic_pdf
+from benchmarks.report import summarize
+
+
+def timed_each(fn, items):
+    latencies = []
+    t0 = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - t0
+
+
+def synthetic_rules(n: int, seed: int = 7):
+    """n regras de duas frases com palavras inventadas (não casam com o corpus)."""
+    rng = random.Random(seed)
+    word = lambda: "".join(rng.choice("bcdfghjklmnpqrstvxz") + rng.choice("aeiou") for _ in range(4))
+    return [
+        Rule(f"synthetic_{i}", "Improdutivo", 0.9, [rf"\b{word()}\s+{word()}\b", rf"\b{word()}\s+(?:de\s+)?{word()}s?\b"])
+        for i in range(n)
+    ]
+
+
+def run(n_emails: int = 2000, pdf_pages: int = 20, pdf_runs: int = 5, batch_size: int = 500) -> dict:
+    emails = synthetic_emails(n_emails)
+    nlp.get_model()  # carrega/treina fora da medição
+    report = {}
+
+    engine = RuleEngine(load_rules())
+    lat, wall = timed_each(engine.find, emails)
+    report["rules_find"] = summarize(lat, wall)
+    for extra in (100, 400):  # o custo por email deve ficar estável com o número de regras
+        engine = RuleEngine(load_rules() + synthetic_rules(extra))
+        lat, wall = timed_each(engine.find, emails)
+        report[f"rules_find_plus_{extra}"] = summarize(lat, wall)
+
+    lat, wall = timed_each(nlp.classify, emails)
+    report["classify_single"] = summarize(lat, wall)
+
+    batches = [emails[i:i + batch_size] for i in range(0, len(emails), batch_size)]
+    lat, wall = timed_each(nlp.classify_batch, batches)
+    report[f"classify_batch_{batch_size}"] = summarize(lat, wall, items=len(emails))
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as fh:
+        fh.write(synthetic_pdf(pdf_pages))
+    try:
+        lat, wall = timed_each(lambda path: pdf.extract_pdf_path(path), [fh.name] * pdf_runs)
+        report[f"pdf_extract_{pdf_pages}p"] = summarize(lat, wall)
+        unbounded = lambda path: pdf.extract_pdf_path(path, max_pages=0, max_chars=sys.maxsize)
+        lat, wall = timed_each(unbounded, [fh.name] * pdf_runs)
+        report[f"pdf_extract_{pdf_pages}p_no_budget"] = summarize(lat, wall)
+    finally:
+        os.unlink(fh.name)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.emails, args.pdf_pages), indent=2))
+
+
+if __name__ == "__main__":
+    main()
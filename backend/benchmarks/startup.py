@@ -0,0 +1,125 @@
+"""
+Tempo de partida a frio da API (o que decide a reação do autoscaler).
+
+    python -m benchmarks.startup [--repeat 5] [--top 10]
+
+- import_ms: custo do "import app" medido com python -X importtime (processo novo
+  a cada repetição), com os módulos diretos mais caros;
+- health_ms / ready_ms: de subir o uvicorn até /api/health e /api/ready
+  responderem 200.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.report import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str):
+    """Linhas "import time: self | cumulative | nome" -> [(nível, nome, cumulativo em µs)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((level, name.strip(), int(cumulative)))
+    return rows
+
+
+def import_time(module: str = "app"):
+    """(µs do import de module, {import direto: µs}) num interpretador novo."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    idx = max(i for i, (level, name, _) in enumerate(rows) if level == 0 and name == module)
+    # os filhos aparecem antes do pai: imports diretos são as linhas de nível 1 acima dele
+    direct = {}
+    for level, name, us in reversed(rows[:idx]):
+        if level == 0:
+            break
+        if level == 1:
+            direct[name] = us
+    return rows[idx][2], direct
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ok(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def time_to_serve(timeout: float = 60.0):
+    """(segundos até /api/health, segundos até /api/ready) de um uvicorn novo."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = started + timeout
+        health = time.perf_counter() - started if _wait_ok(f"{base}/api/health", deadline) else None
+        ready = time.perf_counter() - started if _wait_ok(f"{base}/api/ready", deadline) else None
+        return health, ready
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(repeat: int = 5, top: int = 10) -> dict:
+    totals, direct = [], {}
+    for _ in range(repeat):
+        total, children = import_time()
+        totals.append(total / 1e6)
+        for name, us in children.items():
+            direct.setdefault(name, []).append(us)
+    heaviest = sorted(direct.items(), key=lambda kv: -sorted(kv[1])[len(kv[1]) // 2])[:top]
+
+    health, ready = [], []
+    for _ in range(repeat):
+        h, r = time_to_serve()
+        if h is not None:
+            health.append(h)
+        if r is not None:
+            ready.append(r)
+    return {
+        "import_ms": summarize(totals),
+        "top_imports_ms": {name: round(sorted(v)[len(v) // 2] / 1000, 1) for name, v in heaviest},
+        "health_ms": summarize(health),
+        "ready_ms": summarize(ready),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat, args.top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+
+from starlette.responses import StreamingResponse
+
+# --------- Config bulk (NDJSON) ----------
+BULK_MAX_INFLIGHT = int(os.getenv("BULK_MAX_INFLIGHT", "32"))  # emails em processamento/não enviados
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "10000"))  # partes por multipart
+BULK_MAX_REQUEST_BYTES = int(os.getenv("BULK_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))  # multipart inteiro
+BULK_MAX_LINE = int(os.getenv("BULK_MAX_LINE", str(8 * 1024 * 1024)))  # bytes por linha NDJSON
+
+_DONE = object()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse sem a task que escuta http.disconnect: ela chamaria
+    receive() em paralelo e roubaria os pedaços do corpo que ainda estamos lendo
+    via request.stream() (entrada e saída são consumidas ao mesmo tempo).
+    A background task (ex.: fechar o form) roda no fim, mesmo com erro.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        finally:
+            if self.background is not None:
+                await self.background()
+
+
+async def iter_ndjson(request):
+    """
+    Lê o corpo em streaming e gera (source, texto, erro) por linha
+    {"id": ..., "text": ...}; nunca guarda mais que uma linha em memória.
+    O buffer é um bytearray: as linhas são achadas por offset e os bytes
+    consumidos saem uma vez por pedaço (sem recopiar o resto a cada linha).
+    """
+    buf = bytearray()
+    line_no = 0
+    async for chunk in request.stream():
+        scan = len(buf)  # o que já estava no buffer não tem \n
+        buf += chunk
+        start = 0
+        while True:
+            nl = buf.find(b"\n", max(start, scan))
+            if nl < 0:
+                break
+            line = bytes(buf[start:nl])
+            start = nl + 1
+            line_no += 1
+            if line.strip():
+                yield parse_ndjson_line(line, line_no)
+        del buf[:start]
+        if len(buf) > BULK_MAX_LINE:
+            line_no += 1
+            yield f"line-{line_no}", None, f"Linha maior que {BULK_MAX_LINE} bytes"
+            return
+    if buf.strip():
+        yield parse_ndjson_line(bytes(buf), line_no + 1)
+
+
+def parse_ndjson_line(line: bytes, line_no: int):
+    try:
+        row = json.loads(line)
+        text = str(row.get("text") or "").strip()
+        source = str(row.get("id") or f"line-{line_no}")
+    except Exception as e:
+        return f"line-{line_no}", None, f"JSON inválido: {e}"
+    if not text:
+        return source, None, "Campo 'text' vazio"
+    return source, text, None
+
+
+async def stream_results(items, handle, max_inflight: int = BULK_MAX_INFLIGHT):
+    """
+    Consome items (async iterável) e gera uma linha NDJSON por item, na ordem
+    em que ficam prontos. Um semáforo limita itens em voo + resultados ainda
+    não enviados: se o cliente lê devagar, paramos de ler a entrada (backpressure).
+    handle(index, item) -> dict é o processamento de um item.
+    """
+    slots = asyncio.Semaphore(max_inflight)
+    done = asyncio.Queue()
+
+    async def run_one(index, item):
+        try:
+            result = await handle(index, item)
+        except Exception as e:
+            result = {"index": index, "error": f"Erro interno: {e}"}
+        await done.put(result)
+
+    async def produce():
+        tasks = set()
+        index = 0
+        try:
+            async for item in items:
+                await slots.acquire()
+                task = asyncio.ensure_future(run_one(index, item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                index += 1
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await done.put(_DONE)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            result = await done.get()
+            if result is _DONE:
+                break
+            slots.release()
+            yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        await producer
+    finally:
+        producer.cancel()
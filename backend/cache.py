@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import logger
+
+# --------- Config cache de resultados ----------
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "10000"))  # entradas em memória (LRU)
+CACHE_DB = os.getenv("CACHE_DB", "").strip()  # SQLite opcional, compartilhado entre workers
+CACHE_DB_MAX_ROWS = int(os.getenv("CACHE_DB_MAX_ROWS", "200000"))
+CACHE_DB_TTL = float(os.getenv("CACHE_DB_TTL", str(7 * 24 * 3600)))  # segundos
+CACHE_DB_FLUSH_MS = float(os.getenv("CACHE_DB_FLUSH_MS", "50"))  # escritas acumuladas por flush
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class ResultCache:
+    """
+    Cache de (categoria, confiança, sugestão) endereçado pelo conteúdo:
+    sha256(namespace + texto normalizado). O namespace carrega modo e versão do
+    modelo, então trocar qualquer um invalida as entradas antigas.
+    Camada 1: LRU em memória. Camada 2 (opcional): SQLite em modo WAL, fora do
+    event loop: leituras do lote numa ida a uma thread, escritas acumuladas e
+    gravadas numa transação só por um flush em segundo plano. O disco tem
+    validade (CACHE_DB_TTL) e tamanho máximo (CACHE_DB_MAX_ROWS, sai quem foi
+    gravado há mais tempo).
+    """
+
+    def __init__(self, namespace: str, max_items: int = CACHE_SIZE, db_path: str = CACHE_DB,
+                 max_rows: int = CACHE_DB_MAX_ROWS, ttl: float = CACHE_DB_TTL):
+        self.namespace = namespace
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()  # a conexão é usada por threads do pool
+        self._db_rows = 0  # estimativa (conta no connect, soma nas escritas)
+        self._pending = []  # (chave, valor) à espera do próximo flush
+        self._flush_task = None
+        self.disk_writes = 0
+        self.disk_evictions = 0
+
+    def _connection(self):
+        """
+        Conexão SQLite do processo atual. Aberta no primeiro uso e reaberta
+        após um fork (serve.py importa o app no master): conexões SQLite não
+        podem ser compartilhadas entre processos.
+        """
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_entries_created ON cache_entries (created)")
+            self._db.commit()
+            self._db_rows = self._db.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            self._db_pid = os.getpid()
+        return self._db
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+    async def get_many(self, keys):
+        """Valores (ou None) de keys: memória no loop, faltantes do disco numa thread."""
+        values = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                value = self._items.get(key)
+                if value is not None:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    values[key] = value
+                else:
+                    missing.append(key)
+        if missing and self.db_path:
+            found = await asyncio.to_thread(self._disk_get, missing)
+            with self._lock:
+                for key, value in found.items():
+                    self._remember(key, value)
+                self.hits += len(found)
+                self.disk_hits += len(found)
+            values.update(found)
+        with self._lock:
+            self.misses += sum(1 for key in keys if key not in values)
+        return [values.get(key) for key in keys]
+
+    def put_many(self, items):
+        """Grava [(chave, valor)] na memória na hora; no disco pelo próximo flush."""
+        with self._lock:
+            for key, value in items:
+                self._remember(key, tuple(value))
+        if not self.db_path or not items:
+            return
+        self._pending.extend((key, tuple(value)) for key, value in items)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush(CACHE_DB_FLUSH_MS / 1000))
+
+    async def flush(self, delay: float = 0.0):
+        """Grava as escritas pendentes (de várias requisições) em uma transação por rodada."""
+        if delay:
+            await asyncio.sleep(delay)
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._disk_put, batch)
+            except sqlite3.Error as e:
+                logger.warning("Falha ao gravar o cache em disco: %s", e)
+
+    def _disk_get(self, keys):
+        found = {}
+        with self._db_lock:
+            db = self._connection()
+            oldest = time.time() - self.ttl
+            for start in range(0, len(keys), 500):  # limite de parâmetros do SQLite
+                chunk = keys[start:start + 500]
+                rows = db.execute(
+                    f"SELECT key, value FROM cache_entries WHERE key IN ({','.join('?' * len(chunk))}) "
+                    "AND created >= ?",
+                    (*chunk, oldest),
+                ).fetchall()
+                found.update((key, tuple(json.loads(value))) for key, value in rows)
+        return found
+
+    def _disk_put(self, batch):
+        now = time.time()
+        with self._db_lock:
+            db = self._connection()
+            with db:  # uma transação (um commit) para o lote todo
+                db.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, created) VALUES (?, ?, ?)",
+                    [(key, json.dumps(list(value), ensure_ascii=False), now) for key, value in batch],
+                )
+                evicted = db.execute("DELETE FROM cache_entries WHERE created < ?", (now - self.ttl,)).rowcount
+                self._db_rows += len(batch) - evicted
+                if self._db_rows > self.max_rows:
+                    # a estimativa passou do limite: conta de verdade e remove os mais antigos
+                    rows = db.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+                    if rows > self.max_rows:
+                        evicted += db.execute(
+                            "DELETE FROM cache_entries WHERE key IN "
+                            "(SELECT key FROM cache_entries ORDER BY created LIMIT ?)",
+                            (rows - self.max_rows,),
+                        ).rowcount
+                    self._db_rows = min(rows, self.max_rows)
+            self.disk_writes += len(batch)
+            self.disk_evictions += evicted
+
+    def _remember(self, key: str, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_size": self.max_items,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk": bool(self.db_path),
+                "disk_rows": self._db_rows if self.db_path else None,
+                "disk_writes": self.disk_writes,
+                "disk_evictions": self.disk_evictions,
+            }
@@ -0,0 +1,65 @@
+import os
+from collections import Counter
+
+import nlp
+from hf import HF_TOKEN
+
+# --------- Config cascata local -> HF ----------
+# O classificador local decide tudo que ele classifica com confiança; só os
+# casos ambíguos (ou em regiões sinalizadas) pagam a latência do modelo remoto.
+USE_CASCADE = os.getenv("USE_CASCADE") == "1" and bool(HF_TOKEN)  # precisa do token da HF
+# Vazio = limiar calibrado gravado no artefato do modelo (train.py --escalation-rate)
+CASCADE_THRESHOLD = float(os.environ["CASCADE_THRESHOLD"]) if os.getenv("CASCADE_THRESHOLD") else None
+
+
+class Cascade:
+    """
+    Decide se um resultado local sobe para o modelo remoto: confiança abaixo
+    de threshold ou texto numa região sinalizada (seção "escalate" de
+    rules.json, compilada num RuleEngine). Conta decisões por camada e motivo.
+    Sem threshold fixo vale o calibrado do modelo carregado (acompanha a troca
+    a quente de revisões).
+    """
+
+    def __init__(self, flags, threshold: float = CASCADE_THRESHOLD):
+        self.flags = flags
+        self.fixed_threshold = threshold
+        self.tiers = Counter()  # "local" / "remote"
+        self.reasons = Counter()  # "low_confidence" / "flag:<nome>"
+
+    def escalation(self, conf: float, flag) -> str:
+        """Motivo para escalar (ou None); flag é o resultado de flags.find(texto)."""
+        if flag is not None:
+            return f"flag:{flag.name}"
+        if conf < self.threshold:
+            return "low_confidence"
+        return None
+
+    @property
+    def threshold(self) -> float:
+        return self.fixed_threshold if self.fixed_threshold is not None else nlp.cascade_threshold()
+
+    def route(self, conf: float, flag) -> str:
+        """escalation() já contabilizada (camada, motivo e disparo da região)."""
+        reason = self.escalation(conf, flag)
+        if reason is None:
+            self.tiers["local"] += 1
+            return None
+        self.tiers["remote"] += 1
+        self.reasons[reason] += 1
+        if flag is not None:
+            self.flags.record(flag)
+        return reason
+
+    def escalation_rate(self) -> float:
+        total = self.tiers["local"] + self.tiers["remote"]
+        return round(self.tiers["remote"] / total, 4) if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "calibrated": self.fixed_threshold is None,
+            "tiers": {"local": self.tiers["local"], "remote": self.tiers["remote"]},
+            "escalation_rate": self.escalation_rate(),
+            "reasons": dict(self.reasons),
+        }
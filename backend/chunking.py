@@ -0,0 +1,116 @@
+import os
+
+import nlp
+
+# --------- Config documentos longos ----------
+# Textos acima de CHUNK_CHARS viram janelas de CHUNK_CHARS caracteres (com
+# CHUNK_OVERLAP de sobreposição, cortadas em espaço) classificadas em lote.
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "1500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+CHUNK_MAX_CHUNKS = int(os.getenv("CHUNK_MAX_CHUNKS", "32"))
+# Janelas por chamada ao classificador; entre uma chamada e outra vale a saída
+# antecipada (pequeno o bastante para um documento de PDF_MAX_CHARS ter várias)
+CHUNK_BATCH = int(os.getenv("CHUNK_BATCH", "4"))
+# "max": vence a janela de maior confiança; "vote": voto ponderado por tamanho x confiança
+CHUNK_AGGREGATE = os.getenv("CHUNK_AGGREGATE", "max")
+# Confiança que encerra o documento. Vazio = a calibrada no artefato do modelo
+# local (nlp.early_exit_threshold, acompanha as revisões); as notas do BART
+# (modo HF) têm outra escala e usam CHUNK_EARLY_EXIT_REMOTE
+CHUNK_EARLY_EXIT = float(os.environ["CHUNK_EARLY_EXIT"]) if os.getenv("CHUNK_EARLY_EXIT") else None
+CHUNK_EARLY_EXIT_REMOTE = float(os.getenv("CHUNK_EARLY_EXIT_REMOTE", "0.9"))
+
+
+def split_windows(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP, max_chunks: int = CHUNK_MAX_CHUNKS):
+    """Janelas de até size caracteres, terminando no último espaço quando houver."""
+    windows = []
+    start = 0
+    while start < len(text) and len(windows) < max_chunks:
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        window = text[start:end].strip()
+        if window:
+            windows.append(window)
+        if end >= len(text):
+            break
+        # a próxima janela recomeça overlap caracteres antes, no início de uma palavra
+        nxt = text.find(" ", end - overlap, end) if overlap else -1
+        start = nxt + 1 if nxt > start else end
+    return windows
+
+
+def aggregate(results, weights, rule: str = CHUNK_AGGREGATE):
+    """
+    Junta [(rótulo, confiança)] das janelas em (rótulo, confiança, índice da
+    janela representativa: a de maior confiança no rótulo vencedor).
+    """
+    if rule == "max":
+        best = max(range(len(results)), key=lambda i: results[i][1])
+        return results[best][0], results[best][1], best
+    if rule != "vote":
+        raise ValueError(f"CHUNK_AGGREGATE desconhecido: {rule}")
+    scores = {}
+    for (label, conf), weight in zip(results, weights):
+        scores[label] = scores.get(label, 0.0) + weight * conf
+    label = max(scores, key=scores.get)
+    best = max((i for i, r in enumerate(results) if r[0] == label), key=lambda i: results[i][1])
+    return label, scores[label] / sum(weights), best
+
+
+class Chunker:
+    """
+    Classificação de documentos longos por janelas. As janelas vão ao
+    classificador em lotes de CHUNK_BATCH (uma única chamada para documentos
+    até esse tamanho); depois de cada lote o resultado parcial é agregado e,
+    se a confiança já passou de early_exit, as janelas restantes são puladas.
+    Sem early_exit fixo vale o calibrado do modelo local carregado.
+    """
+
+    def __init__(self, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP, batch: int = CHUNK_BATCH,
+                 rule: str = CHUNK_AGGREGATE, early_exit: float = CHUNK_EARLY_EXIT):
+        self.size = size
+        self.overlap = overlap
+        self.batch = max(1, batch)
+        self.rule = rule
+        self.early_exit = early_exit
+        self.documents = 0
+        self.chunks = 0
+        self.early_exits = 0
+
+    def is_long(self, text: str) -> bool:
+        return len(text) > self.size
+
+    def exit_threshold(self) -> float:
+        return self.early_exit if self.early_exit is not None else nlp.early_exit_threshold()
+
+    async def classify(self, text: str, classify_many, early_exit: float = None):
+        """
+        (rótulo, confiança, janela representativa) de um texto longo;
+        classify_many é async e recebe/devolve listas, como
+        MicroBatcher.submit_many. early_exit substitui o limiar desta
+        chamada (ex.: notas de outro modelo).
+        """
+        windows = split_windows(text, self.size, self.overlap)
+        threshold = early_exit if early_exit is not None else self.exit_threshold()
+        results = []
+        for start in range(0, len(windows), self.batch):
+            results.extend(await classify_many(windows[start:start + self.batch]))
+            label, conf, best = aggregate(results, [len(w) for w in windows[:len(results)]], self.rule)
+            if conf >= threshold and len(results) < len(windows):
+                self.early_exits += 1
+                break
+        self.documents += 1  # só os que terminaram (classify_many pode levantar)
+        self.chunks += len(results)
+        return label, conf, windows[best]
+
+    def stats(self) -> dict:
+        return {
+            "documents": self.documents,
+            "chunks": self.chunks,
+            "early_exits": self.early_exits,
+            "chunk_chars": self.size,
+            "aggregate": self.rule,
+            "early_exit": self.exit_threshold(),
+        }
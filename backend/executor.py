@@ -0,0 +1,54 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from threadpoolctl import threadpool_limits
+
+# --------- Config execução da classificação ----------
+# Onde roda o trabalho CPU-bound (regras, predict_proba, session.run):
+#   "thread"  pool de threads (padrão): libera o event loop; numpy/scipy/ONNX
+#             soltam o GIL nas partes pesadas
+#   "process" pool de processos: paralelismo real, cada processo carrega o
+#             próprio modelo (o artefato é mmap, as páginas são compartilhadas)
+#   "inline"  no próprio event loop (comportamento antigo)
+CLASSIFY_EXECUTOR = os.getenv("CLASSIFY_EXECUTOR", "thread")
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Threads de BLAS/OpenMP por worker do pool: o paralelismo vem do próprio pool,
+# então o padrão evita N workers x M threads de BLAS disputando os núcleos.
+CLASSIFY_BLAS_THREADS = int(os.getenv("CLASSIFY_BLAS_THREADS", "1"))
+
+_executor = None
+
+
+def _init_worker():
+    threadpool_limits(limits=CLASSIFY_BLAS_THREADS)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if CLASSIFY_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=CLASSIFY_WORKERS, initializer=_init_worker)
+        elif CLASSIFY_EXECUTOR == "thread":
+            _init_worker()  # threadpoolctl vale para o processo todo
+            _executor = ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS, thread_name_prefix="classify")
+        else:
+            raise ValueError(f"CLASSIFY_EXECUTOR desconhecido: {CLASSIFY_EXECUTOR}")
+    return _executor
+
+
+def shutdown_executor(wait: bool = False):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=not wait)
+        _executor = None
+
+
+async def run_cpu(fn, *args):
+    """
+    Executa fn(*args) fora do event loop, no pool configurado. No modo process
+    fn e args precisam ser serializáveis (funções de módulo, listas de textos).
+    """
+    if CLASSIFY_EXECUTOR == "inline":
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
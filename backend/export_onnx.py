@@ -0,0 +1,42 @@
+"""
+Exporta o modelo NLI multilíngue para ONNX e quantiza os pesos em int8 (modo USE_ONNX=1).
+
+Dependências só desta etapa (não vão para o servidor):
+    pip install "optimum[exporters]" transformers torch
+
+Uso (dentro de backend/):
+    python export_onnx.py
+    python export_onnx.py --model MoritzLaurer/multilingual-MiniLMv2-L6-mnli-xnli --out models/onnx
+
+Gera em --out: model.onnx, model_quantized.onnx, config.json e tokenizer.json.
+"""
+import argparse
+import os
+
+from onnx_model import ONNX_MODEL_DIR, ONNX_MODEL_FILE
+
+DEFAULT_MODEL = "MoritzLaurer/multilingual-MiniLMv2-L6-mnli-xnli"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta e quantiza o modelo ONNX local.")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="modelo NLI no Hugging Face Hub")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    model = ORTModelForSequenceClassification.from_pretrained(args.model, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    model.save_pretrained(args.out)
+    tokenizer.save_pretrained(args.out)  # tokenizer.json (fast) é o que o servidor lê
+
+    quantized = os.path.join(args.out, ONNX_MODEL_FILE)
+    quantize_dynamic(os.path.join(args.out, "model.onnx"), quantized, weight_type=QuantType.QInt8)
+    print(f"modelo {args.model} exportado; int8 em {quantized}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import fcntl
+import hmac
+import json
+import os
+import threading
+import time
+
+import nlp
+from metrics import logger
+from nlp import CLASSES, MODEL_DIR
+
+# --------- Config feedback ----------
+# Correções dos operadores num JSONL compartilhado pelos workers; o treino
+# continua do ponto (offset em bytes) gravado no ponteiro da última revisão.
+FEEDBACK_PATH = os.getenv("FEEDBACK_PATH", os.path.join(MODEL_DIR, "feedback.jsonl"))
+# Credencial dos operadores (cabeçalho X-Feedback-Token); vazio desliga /api/feedback
+FEEDBACK_TOKEN = os.getenv("FEEDBACK_TOKEN", "").strip()
+# Textos distintos pendentes para treinar: uma chamada isolada não retreina produção
+FEEDBACK_MIN_SAMPLES = int(os.getenv("FEEDBACK_MIN_SAMPLES", "20"))
+FEEDBACK_MAX_SAMPLES = int(os.getenv("FEEDBACK_MAX_SAMPLES", "10000"))  # por rodada de treino
+# Correções mais recentes usadas para recalibrar a cascata a cada revisão
+FEEDBACK_CALIBRATION_SAMPLES = int(os.getenv("FEEDBACK_CALIBRATION_SAMPLES", "2000"))
+FEEDBACK_KEEP_REVISIONS = int(os.getenv("FEEDBACK_KEEP_REVISIONS", "3"))  # artefatos antigos mantidos
+FEEDBACK_MAX_ITEMS = 1000  # correções por requisição
+
+
+class FeedbackError(ValueError):
+    pass
+
+
+def check_token(token: str) -> bool:
+    """Compara com FEEDBACK_TOKEN em tempo constante; sem token configurado nada passa."""
+    return bool(FEEDBACK_TOKEN) and hmac.compare_digest((token or "").encode(), FEEDBACK_TOKEN.encode())
+
+
+def parse_feedback(payload) -> list:
+    """
+    [(texto, rótulo)] de {"text": ..., "label": ...} ou {"items": [...]};
+    FeedbackError para rótulos fora de CLASSES ou textos vazios.
+    """
+    if not isinstance(payload, dict):
+        raise FeedbackError("Envie um objeto JSON com text/label ou items.")
+    items = payload.get("items", [payload])
+    if not isinstance(items, list) or not items:
+        raise FeedbackError("items deve ser uma lista não vazia.")
+    if len(items) > FEEDBACK_MAX_ITEMS:
+        raise FeedbackError(f"No máximo {FEEDBACK_MAX_ITEMS} correções por requisição.")
+    parsed = []
+    for i, item in enumerate(items):
+        text = item.get("text") if isinstance(item, dict) else None
+        label = item.get("label") if isinstance(item, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise FeedbackError(f"Item {i}: text vazio.")
+        if label not in CLASSES:
+            raise FeedbackError(f"Item {i}: label deve ser um de {CLASSES}.")
+        parsed.append((text.strip(), label))
+    return parsed
+
+
+class FeedbackStore:
+    """
+    JSONL só de acréscimo. Cada chamada a append é um único write com
+    O_APPEND, então linhas de workers diferentes não se misturam.
+    """
+
+    def __init__(self, path: str = FEEDBACK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.accepted = 0
+
+    def append(self, items) -> int:
+        data = "".join(
+            json.dumps({"text": text, "label": label, "ts": time.time()}, ensure_ascii=False) + "\n"
+            for text, label in items
+        ).encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self.accepted += len(items)
+        return len(items)
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read_since(self, offset: int, limit: int = FEEDBACK_MAX_SAMPLES):
+        """
+        (textos, rótulos, novo offset) das linhas completas depois de offset.
+        Cada texto entra uma vez por rodada, com o último rótulo enviado:
+        repetir a mesma correção não aumenta o peso dela no treino.
+        """
+        latest = {}  # texto -> rótulo
+        if not os.path.exists(self.path):
+            return [], [], offset
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break  # linha ainda sendo escrita: fica para a próxima rodada
+                offset += len(line)
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                text = " ".join(str(row.get("text") or "").split())
+                if row.get("label") in CLASSES and text:
+                    latest.pop(text, None)
+                    latest[text] = row["label"]
+                if len(latest) >= limit:
+                    break
+        return list(latest), list(latest.values()), offset
+
+
+    def recent_texts(self, limit: int = FEEDBACK_CALIBRATION_SAMPLES, max_bytes: int = 4 * 1024 * 1024):
+        """Até limit textos distintos do fim do arquivo (lê no máximo max_bytes)."""
+        size = self.size()
+        if not size:
+            return []
+        start = max(0, size - max_bytes)
+        texts = {}
+        with open(self.path, "rb") as fh:
+            fh.seek(start)
+            if start:
+                fh.readline()  # linha cortada no meio
+            for line in fh:
+                try:
+                    text = " ".join(str(json.loads(line).get("text") or "").split())
+                except ValueError:
+                    continue
+                if text:
+                    texts.pop(text, None)
+                    texts[text] = None
+        return list(texts)[-limit:]
+
+
+class FeedbackTrainer:
+    """
+    Treino incremental fora do caminho da requisição: lê as correções novas,
+    continua o treino da revisão publicada (update_model, partial_fit) e
+    publica a próxima revisão com nlp.publish_model. Um flock garante um
+    único treino por vez entre os workers; quem não pega o lock só segue.
+    """
+
+    def __init__(self, store: FeedbackStore, min_samples: int = FEEDBACK_MIN_SAMPLES):
+        self.store = store
+        self.min_samples = max(1, min_samples)
+        self.lock_path = os.path.join(os.path.dirname(nlp.MODEL_POINTER), "train.lock")
+        self.rounds = 0
+        self.samples = 0
+        self.last_seconds = None
+        self.last_error = None
+
+    def pending(self) -> bool:
+        pointer = nlp.read_pointer() or {}
+        return self.store.size() > pointer.get("feedback_offset", 0)
+
+    def train(self):
+        """Publica uma revisão nova se houver correções suficientes; devolve a revisão ou None."""
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None  # outro worker está treinando
+            try:
+                return self._train_locked()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Falha no treino com feedback: %s", e)
+                return None
+
+    def _train_locked(self):
+        started = time.perf_counter()
+        pointer = nlp.read_pointer() or {"revision": 0, "feedback_offset": 0, "samples": 0}
+        texts, labels, offset = self.store.read_since(pointer["feedback_offset"])
+        if len(texts) < self.min_samples:
+            return None
+        try:
+            _, pipeline = nlp.load_current(mmap_mode=None)
+        except FileNotFoundError:
+            pipeline = nlp.train_model()
+        nlp.update_model(pipeline, texts, labels)
+        # as probabilidades mudaram com o treino: o limiar da cascata é refeito
+        # nas correções recentes, com a mesma taxa de escalonamento
+        calibration = nlp.calibrate(pipeline, self.store.recent_texts())
+        revision = pointer["revision"] + 1
+        nlp.publish_model(
+            pipeline, revision, calibration=calibration,
+            feedback_offset=offset, samples=pointer.get("samples", 0) + len(texts),
+        )
+        self._prune(revision)
+        self.rounds += 1
+        self.samples += len(texts)
+        self.last_seconds = round(time.perf_counter() - started, 3)
+        self.last_error = None
+        logger.info(
+            "Revisão %d do modelo publicada com %d correção(ões); limiar da cascata %s",
+            revision, len(texts), calibration.get("cascade_threshold"),
+        )
+        return revision
+
+    def _prune(self, revision: int):
+        # workers que ainda mapeiam um artefato removido continuam lendo (unlink no Linux)
+        for old in range(revision - FEEDBACK_KEEP_REVISIONS, 0, -1):
+            try:
+                os.remove(nlp.revision_path(old))
+            except FileNotFoundError:
+                break
+
+    def stats(self) -> dict:
+        pointer = nlp.read_pointer() or {}
+        return {
+            "accepted": self.store.accepted,
+            "published_revision": pointer.get("revision", 0),
+            "published_samples": pointer.get("samples", 0),
+            "pending_bytes": max(0, self.store.size() - pointer.get("feedback_offset", 0)),
+            "rounds": self.rounds,
+            "samples": self.samples,
+            "last_seconds": self.last_seconds,
+            "last_error": self.last_error,
+        }
@@ -1,27 +1,199 @@
-def hf_generate_reply(category: str, email_text: str) -> str:
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+# Local ML (fallback)
+from nlp import classify as local_classify
+from templates import PRODUCTIVE_REPLY, NON_PRODUCTIVE_REPLY
+from executor import run_cpu
+from metrics import logger, timed
+from resilience import (
+    HF_CLASSIFY_SHARE, HF_DEADLINE, CircuitBreaker, CircuitOpen, Hedge, deadline_stats, mark_degraded,
+    stage_timeout,
+)
+
+# --------- Config HF (opcional) ----------
+USE_HF_ENV = os.getenv("USE_HF") == "1"
+HF_TOKEN = os.getenv("HF_TOKEN", "").strip()
+USE_HF = bool(USE_HF_ENV and HF_TOKEN)  # só ativa HF se houver token
+
+HF_HEADERS = {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else {}
+HF_ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+HF_T2T_MODEL = "google/flan-t5-base"  # para gerar resposta curta em PT-BR
+
+# Base da Inference API; aponte para um servidor mock local em testes (ver mock_hf.py)
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co").rstrip("/")
+
+# --------- Cliente HTTP compartilhado ----------
+HF_HTTP2 = os.getenv("HF_HTTP2", "1") == "1"
+HF_MAX_CONNECTIONS = int(os.getenv("HF_MAX_CONNECTIONS", "20"))
+HF_MAX_CONCURRENCY = int(os.getenv("HF_MAX_CONCURRENCY", "8"))  # requisições simultâneas por host
+# Janelas de um mesmo documento longo em voo ao mesmo tempo: abaixo do limite
+# do host, para um documento grande não tomar todas as vagas
+HF_DOC_CONCURRENCY = max(1, min(int(os.getenv("HF_DOC_CONCURRENCY", "4")), HF_MAX_CONCURRENCY - 1))
+
+_client = None
+_host_limits = {}  # host -> asyncio.Semaphore
+_inflight = {}  # chave da requisição -> Task em andamento (coalescing)
+
+
+def _is_service_failure(exc) -> bool:
+    """Timeouts, erros de rede, 5xx e 429 abrem o circuito; outros 4xx são do pedido."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+
+# um circuito por modelo: um pode estar frio (503 carregando) e o outro não
+_breakers = {kind: CircuitBreaker(kind, is_failure=_is_service_failure) for kind in ("zero-shot", "generate")}
+_hedge = Hedge()
+
+
+def get_client() -> "httpx.AsyncClient":
     """
-    Gera uma resposta curta e educada em PT-BR com FLAN-T5 (text2text).
+    AsyncClient único por processo: reaproveita conexões TLS (keep-alive/HTTP2).
+    httpx só é importado aqui, na primeira chamada remota.
     """
-    url = "https://api-inference.huggingface.co/models/google/flan-t5-base"
+    global _client
+    if _client is None:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            http2=HF_HTTP2,
+            headers=HF_HEADERS,
+            limits=httpx.Limits(
+                max_connections=HF_MAX_CONNECTIONS,
+                max_keepalive_connections=HF_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _post_json(url: str, payload: dict, timeout: float):
+    host = urlsplit(url).netloc
+    limit = _host_limits.get(host)
+    if limit is None:
+        limit = _host_limits[host] = asyncio.Semaphore(HF_MAX_CONCURRENCY)
+    async with limit:
+        r = await get_client().post(url, json=payload, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+
+async def _attempt(url: str, payload: dict, timeout: float):
+    # timeout total (o do httpx vale por fase), com a cópia do hedging se ligado
+    return await asyncio.wait_for(_hedge.call(_post_json, url, payload, timeout), timeout)
+
+
+async def _coalesced(kind: str, key, url: str, payload: dict, timeout: float):
+    """
+    Requisições idênticas em voo compartilham a mesma chamada upstream, que
+    passa pelo circuito do modelo (kind). shield evita que o cancelamento de um
+    chamador cancele a dos demais; cada um espera no máximo o próprio timeout.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_breakers[kind].call(_attempt, url, payload, timeout))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None) and not t.cancelled() and t.exception())
+    return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+
+def _log_failure(stage: str, e: Exception):
+    mark_degraded()
+    if not isinstance(e, CircuitOpen):  # circuito aberto já foi avisado uma vez
+        logger.warning("HF %s falhou: %r", stage, e)
+
+
+def remote_stats() -> dict:
+    return {
+        "deadline_seconds": HF_DEADLINE,
+        "deadline": dict(deadline_stats),
+        "breakers": {kind: breaker.stats() for kind, breaker in _breakers.items()},
+        "hedge": _hedge.stats(),
+    }
+
+
+async def hf_zero_shot_productive(text: str):
+    """
+    Zero-shot (BART-MNLI) com fallback local: erro, circuito aberto ou
+    orçamento da requisição esgotado (ver resilience.py).
+    """
+    try:
+        return await _zero_shot(text)
+    except Exception as e:
+        _log_failure("zero-shot", e)
+        return await run_cpu(local_classify, text)
+
+
+async def _zero_shot(text: str):
+    url = f"{HF_API_URL}/models/{HF_ZERO_SHOT_MODEL}"
+    payload = {
+        "inputs": text,
+        "parameters": {"candidate_labels": ["Produtivo", "Improdutivo"], "multi_label": False},
+    }
+    timeout = stage_timeout(45, HF_CLASSIFY_SHARE)  # o resto do orçamento fica para a geração
+    with timed("hf_zero_shot"):
+        data = await _coalesced("zero-shot", ("zero-shot", text), url, payload, timeout)
+    return data["labels"][0], float(data["scores"][0])
+
+
+async def hf_zero_shot_batch(texts):
+    """
+    Zero-shot das janelas de um documento longo, até HF_DOC_CONCURRENCY em voo.
+    Sem fallback por janela: confiança do BART e do modelo local não se
+    comparam na agregação. Se qualquer janela falhar, as outras são canceladas
+    e a exceção sobe; quem chama classifica o documento inteiro localmente.
+    """
+    limit = asyncio.Semaphore(HF_DOC_CONCURRENCY)
+
+    async def one(text):
+        async with limit:
+            return await _zero_shot(text)
+
+    tasks = [asyncio.ensure_future(one(text)) for text in texts]
+    try:
+        return await asyncio.gather(*tasks)
+    except Exception as e:
+        for task in tasks:
+            task.cancel()
+        _log_failure("zero-shot", e)
+        raise
+
+
+async def hf_generate_reply(category: str, email_text: str, fallback: bool = True):
+    """
+    Gera resposta breve em PT-BR (FLAN-T5) com fallback fixo, dentro do que
+    sobrou do orçamento da requisição.
+    fallback=False devolve None em caso de erro (quem chama decide o fallback).
+    """
+    url = f"{HF_API_URL}/models/{HF_T2T_MODEL}"
     prompt = (
         "Você é um assistente de suporte ao cliente de uma empresa financeira.\n"
         f"Categoria do email: {category}\n"
         "Objetivo: redigir uma resposta breve, educada e clara em português do Brasil.\n"
-        "Se for Produtivo: confirme recebimento, explique próximo passo e prazo curto.\n"
-        "Se for Improdutivo: agradeça e informe que não é necessária ação.\n\n"
+        "- Se for Produtivo: confirme recebimento, explique próximo passo e prazo curto.\n"
+        "- Se for Improdutivo: agradeça e informe que não é necessária ação.\n\n"
         f"Email do cliente:\n\"{email_text}\"\n\n"
         "Resposta:"
     )
-    payload = {
-        "inputs": prompt,
-        "parameters": {"max_new_tokens": 120, "temperature": 0.2}
-    }
-    r = httpx.post(url, headers=HEADERS, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    # Em text2text, geralmente vem como [{"generated_text": "..."}]
+    payload = {"inputs": prompt, "parameters": {"max_new_tokens": 120, "temperature": 0.2}}
     try:
-        return data[0]["generated_text"].strip()
-    except Exception:
-        # fallback simples
-        return "Olá! Obrigado pela mensagem. Em breve retornaremos com mais informações."
+        timeout = stage_timeout(60)
+        with timed("hf_generate"):
+            data = await _coalesced("generate", ("generate", prompt), url, payload, timeout)
+        text = (data[0].get("generated_text") or "").strip()
+        if text:
+            return text
+    except Exception as e:
+        _log_failure("generate", e)
+
+    if not fallback:
+        return None
+    return PRODUCTIVE_REPLY if category == "Produtivo" else NON_PRODUCTIVE_REPLY
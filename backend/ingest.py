@@ -0,0 +1,196 @@
+import asyncio
+import os
+import zipfile
+from email import message_from_binary_file, policy
+from email.parser import BytesParser
+from html.parser import HTMLParser
+from io import BytesIO
+
+from metrics import logger
+from pdf import extract_pdf_fileobj
+
+# --------- Config ingestão de caixas de email (.eml, .mbox, .zip) ----------
+INGEST_MAX_MESSAGES = int(os.getenv("INGEST_MAX_MESSAGES", "10000"))  # por upload
+INGEST_MAX_MEMBER = int(os.getenv("INGEST_MAX_MEMBER", str(25 * 1024 * 1024)))  # bytes descompactados por membro do zip
+
+EML_TYPES = {"message/rfc822"}
+MBOX_TYPES = {"application/mbox"}
+ZIP_TYPES = {"application/zip", "application/x-zip-compressed"}
+# policy.default decodifica cabeçalhos RFC 2047 (=?utf-8?b?...?=) e nomes de
+# anexo RFC 2231; o compat32 padrão entregaria o assunto codificado ao modelo
+EMAIL_POLICY = policy.default
+
+_END = object()
+
+
+def archive_kind(filename: str, content_type: str = ""):
+    """'eml', 'mbox', 'zip' ou None (upload comum, tratado como texto/PDF)."""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".eml") or ctype in EML_TYPES:
+        return "eml"
+    if name.endswith(".mbox") or ctype in MBOX_TYPES:
+        return "mbox"
+    if name.endswith(".zip") or ctype in ZIP_TYPES:
+        return "zip"
+    return None
+
+
+class _HTMLText(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag in ("br", "p", "div", "li", "tr"):
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def _decode_part(part) -> str:
+    payload = part.get_payload(decode=True) or b""
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("latin-1", errors="replace")
+
+
+def message_text(msg):
+    """
+    Texto classificável de uma mensagem: assunto + text/plain (ou html→texto se
+    não houver plain) + anexos textuais. PDFs anexados voltam à parte, em bytes,
+    para serem extraídos no pool de PDF. Cabeçalhos e base64 ficam de fora.
+    """
+    plain, html, attachments, pdfs = [], [], [], []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        ctype = part.get_content_type()
+        filename = (part.get_filename() or "").lower()
+        if ctype == "application/pdf" or filename.endswith(".pdf"):
+            data = part.get_payload(decode=True)
+            if data:
+                pdfs.append(data)
+            continue
+        if part.get_content_disposition() == "attachment":
+            if ctype.startswith("text/"):
+                text = _decode_part(part)
+                attachments.append(html_to_text(text) if ctype == "text/html" else text)
+            continue
+        if ctype == "text/plain":
+            plain.append(_decode_part(part))
+        elif ctype == "text/html":
+            html.append(html_to_text(_decode_part(part)))
+
+    subject = str(msg.get("subject") or "")
+    text = "\n".join([subject] + (plain or html) + attachments)
+    return text, pdfs
+
+
+def iter_mbox(fp):
+    """Divide um mbox nas linhas 'From ' sem carregar o arquivo: uma mensagem por vez em memória."""
+    lines = []
+    for line in fp:
+        if line.startswith(b"From "):
+            # linha de envelope: fecha a mensagem anterior e não entra no cabeçalho
+            if lines:
+                yield BytesParser(policy=EMAIL_POLICY).parsebytes(b"".join(lines))
+                lines = []
+            continue
+        if line.startswith(b">From "):
+            line = line[1:]
+        lines.append(line)
+    if lines:
+        yield BytesParser(policy=EMAIL_POLICY).parsebytes(b"".join(lines))
+
+
+def _iter_zip(fp, name: str):
+    with zipfile.ZipFile(fp) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            source = f"{name}/{info.filename}"
+            kind = archive_kind(info.filename)
+            member = info.filename.lower()
+            if info.file_size > INGEST_MAX_MEMBER:
+                yield source, None, [], f"Arquivo maior que {INGEST_MAX_MEMBER} bytes no zip"
+            elif kind == "eml":
+                with zf.open(info) as member_fp:
+                    yield (source, *message_text(message_from_binary_file(member_fp, policy=EMAIL_POLICY)), None)
+            elif kind == "mbox":
+                with zf.open(info) as member_fp:
+                    for n, msg in enumerate(iter_mbox(member_fp), 1):
+                        yield (f"{source}#{n}", *message_text(msg), None)
+            elif member.endswith(".pdf"):
+                yield source, "", [zf.read(info)], None
+            elif member.endswith(".txt"):
+                yield source, zf.read(info).decode("utf-8", errors="replace"), [], None
+            # demais membros (imagens, zips aninhados, ...) são ignorados
+
+
+def iter_archive(fp, name: str, kind: str):
+    """Gerador síncrono de (source, texto, pdfs, erro) por mensagem do arquivo."""
+    fp.seek(0)
+    if kind == "eml":
+        yield (name, *message_text(message_from_binary_file(fp, policy=EMAIL_POLICY)), None)
+    elif kind == "mbox":
+        for n, msg in enumerate(iter_mbox(fp), 1):
+            yield (f"{name}#{n}", *message_text(msg), None)
+    elif kind == "zip":
+        yield from _iter_zip(fp, name)
+
+
+async def iter_upload_messages(upload, kind: str):
+    """
+    Versão assíncrona: cada passo do gerador roda numa thread (parsing é
+    bloqueante) e os PDFs anexados vão para o pool de PDF.
+    Gera (source, texto, erro), no máximo INGEST_MAX_MESSAGES por upload.
+    """
+    name = upload.filename or "upload"
+    messages = iter_archive(upload.file, name, kind)
+    count = 0
+    while True:
+        try:
+            item = await asyncio.to_thread(next, messages, _END)
+        except Exception as e:
+            yield name, None, f"Erro ao ler arquivo de emails: {e}"
+            return
+        if item is _END:
+            return
+        count += 1
+        if count > INGEST_MAX_MESSAGES:
+            yield name, None, f"Limite de {INGEST_MAX_MESSAGES} mensagens por arquivo atingido"
+            return
+
+        source, text, pdfs, error = item
+        parts = [text] if text else []
+        for data in pdfs:
+            try:
+                parts.append(await extract_pdf_fileobj(BytesIO(data)))
+            except Exception as e:
+                logger.warning("PDF anexo ignorado em %s: %s", source, e)
+        text = "\n".join(parts).strip()
+        if error:
+            yield source, None, error
+        elif not text:
+            yield source, None, "Mensagem sem conteúdo de texto"
+        else:
+            yield source, text, None
@@ -0,0 +1,119 @@
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --------- Logs ----------
+# LOG_LEVEL=DEBUG liga os logs detalhados por requisição; LOG_SAMPLE_RATE (0..1)
+# define a fração de requisições amostradas. Desligado, debug() custa uma leitura
+# de ContextVar e a mensagem nunca é formatada.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+logger = logging.getLogger("email_classifier")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(LOG_LEVEL)
+
+_sampled = ContextVar("log_sampled", default=False)
+
+
+def sample_request() -> bool:
+    """Sorteia se a requisição atual terá logs de debug (vale para as tasks filhas)."""
+    sampled = logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE
+    _sampled.set(sampled)
+    return sampled
+
+
+def debug_enabled() -> bool:
+    """Se a requisição atual foi sorteada: use antes de montar argumentos caros."""
+    return _sampled.get()
+
+
+def debug(msg: str, *args):
+    if _sampled.get():
+        logger.debug(msg, *args)
+
+
+# --------- Métricas (formato texto do Prometheus) ----------
+STAGES = (
+    "admission_wait", "form_parse", "file_read", "pdf_extract", "rule_precheck",
+    "local_classify", "hf_zero_shot", "hf_generate",
+)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Histograma cumulativo com buckets fixos e um label (ex.: stage)."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # valor do label -> [contagens por bucket..., +Inf], soma
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1]) for k, v in self._series.items()}
+        for value, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {cumulative}')
+        return lines
+
+
+stage_seconds = Histogram(
+    "email_classifier_stage_seconds", "Latência por estágio do processamento.", "stage"
+)
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(stage, time.perf_counter() - t0)
+
+
+def render(gauges: dict = None, counters: dict = None) -> str:
+    """
+    Exposição completa: histogramas + valores instantâneos (gauges) e totais
+    acumulados (counters, nomes terminados em _total) do app.
+    """
+    lines = stage_seconds.render()
+    typed = set()
+    for kind, values in (("gauge", gauges), ("counter", counters)):
+        for name, value in (values or {}).items():
+            base = name.split("{", 1)[0]  # aceita nomes com labels: metric{rule="x"}
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {base} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+"""
+Servidor mock da HF Inference API para testes locais.
+
+Uso (dentro de backend/):
+    uvicorn mock_hf:app --port 8001
+    HF_API_URL=http://localhost:8001 USE_HF=1 HF_TOKEN=x uvicorn app:app
+
+MOCK_HF_DELAY (segundos) simula a latência do modelo. Falhas injetadas
+(variáveis de ambiente na partida ou POST /faults com o JSON abaixo em
+execução, só os campos a mudar):
+    error_rate   fração de chamadas que respondem 503 (modelo carregando)
+    slow_rate    fração de chamadas que demoram slow_delay segundos (cauda)
+    slow_delay
+    down         true: toda chamada responde 503
+    hang         true: toda chamada fica pendurada (timeout do cliente)
+
+Ex.: curl -XPOST localhost:8001/faults -d '{"down": true}'
+"""
+import asyncio
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+MOCK_HF_DELAY = float(os.getenv("MOCK_HF_DELAY", "0"))
+
+app = FastAPI(title="Mock HF Inference API")
+calls = {"zero-shot": 0, "generate": 0, "failed": 0, "slow": 0}
+faults = {
+    "delay": MOCK_HF_DELAY,
+    "error_rate": float(os.getenv("MOCK_HF_ERROR_RATE", "0")),
+    "slow_rate": float(os.getenv("MOCK_HF_SLOW_RATE", "0")),
+    "slow_delay": float(os.getenv("MOCK_HF_SLOW_DELAY", "5")),
+    "down": os.getenv("MOCK_HF_DOWN") == "1",
+    "hang": False,
+}
+_random = random.Random(os.getenv("MOCK_HF_SEED"))
+
+
+@app.post("/models/{owner}/{name}")
+async def infer(owner: str, name: str, request: Request):
+    body = await request.json()
+    if faults["hang"]:
+        await asyncio.sleep(3600)
+    if faults["down"] or _random.random() < faults["error_rate"]:
+        calls["failed"] += 1
+        return JSONResponse({"error": "Model is currently loading", "estimated_time": 20.0}, status_code=503)
+    delay = faults["delay"]
+    if _random.random() < faults["slow_rate"]:
+        calls["slow"] += 1
+        delay += faults["slow_delay"]
+    if delay:
+        await asyncio.sleep(delay)
+
+    if "candidate_labels" in (body.get("parameters") or {}):
+        calls["zero-shot"] += 1
+        labels = list(body["parameters"]["candidate_labels"])
+        text = (body.get("inputs") or "").lower()
+        if not any(w in text for w in ("status", "chamado", "solicitação", "anexo", "erro")):
+            labels.reverse()
+        return {"sequence": body.get("inputs"), "labels": labels, "scores": [0.9, 0.1]}
+
+    calls["generate"] += 1
+    # ecoa o protocolo do email, como o modelo real costuma fazer
+    m = re.search(r"protocolo\s+(\S*\d)", body.get("inputs") or "", re.IGNORECASE)
+    ref = f" sobre o protocolo {m.group(1)}" if m else ""
+    return [{"generated_text": f"Olá! Recebemos sua mensagem{ref} e retornaremos em breve."}]
+
+
+@app.get("/calls")
+def get_calls():
+    return calls
+
+
+@app.get("/faults")
+def get_faults():
+    return faults
+
+
+@app.post("/faults")
+async def set_faults(request: Request):
+    """Muda as falhas injetadas em execução (campos ausentes ficam como estão)."""
+    body = await request.json()
+    for name, value in body.items():
+        if name in faults:
+            faults[name] = type(faults[name])(value)
+    return faults
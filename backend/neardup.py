@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from nlp import clean_text, load_stopwords
+
+# --------- Config quase-duplicatas ----------
+NEARDUP_ENABLED = os.getenv("NEARDUP_ENABLED", "1") == "1"
+NEARDUP_SIZE = int(os.getenv("NEARDUP_SIZE", "20000"))  # assinaturas em memória (LRU)
+# Distância de Hamming máxima (em 64 bits) para considerar dois emails o mesmo
+NEARDUP_MAX_DISTANCE = int(os.getenv("NEARDUP_MAX_DISTANCE", "5"))
+NEARDUP_MIN_TOKENS = int(os.getenv("NEARDUP_MIN_TOKENS", "5"))  # textos menores não entram
+
+BITS = 64
+# Bandas do LSH: com MAX_DISTANCE < BANDS, duas assinaturas próximas sempre
+# coincidem em pelo menos uma banda inteira (casa dos pombos).
+BANDS = 8
+BAND_BITS = BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Lista empacotada, não a do modelo: a assinatura não muda quando o modelo
+# termina de carregar (ou é trocado).
+STOPWORDS = frozenset(load_stopwords())
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str):
+    """
+    SimHash de 64 bits sobre os tokens de clean_text (unigramas e bigramas,
+    pesados pela contagem). Números já saem no clean_text, então protocolos e
+    datas diferentes não mudam a assinatura. None para textos curtos demais.
+    """
+    import numpy as np
+
+    tokens = clean_text(text, STOPWORDS).split()
+    if len(tokens) < NEARDUP_MIN_TOKENS:
+        return None
+    counts = Counter(tokens)
+    counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    hashes = np.fromiter((_feature_hash(f) for f in counts), dtype=np.uint64, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    score = weights @ (bits.astype(np.int8) * 2 - 1)
+    return int.from_bytes(np.packbits(score > 0, bitorder="little").tobytes(), "little")
+
+
+def simhash_many(texts):
+    return [simhash(text) for text in texts]
+
+
+def _bands(sig: int):
+    return [(b, (sig >> (b * BAND_BITS)) & BAND_MASK) for b in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """
+    Índice de quase-duplicatas: assinatura SimHash -> decisão já tomada.
+    Candidatos vêm dos buckets LSH (uma banda de 8 bits igual) e são
+    confirmados pela distância de Hamming. Memória limitada: LRU de
+    max_items assinaturas, removidas também dos buckets na evicção.
+    """
+
+    def __init__(self, max_items: int = NEARDUP_SIZE, max_distance: int = NEARDUP_MAX_DISTANCE):
+        self.max_items = max_items
+        self.max_distance = min(max_distance, BANDS - 1)
+        self._items = OrderedDict()  # assinatura -> valor
+        self._buckets = {}  # (banda, valor da banda) -> set de assinaturas
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.grouped = 0  # textos decididos pelo representante do grupo no mesmo lote
+
+    def nearest(self, sig: int):
+        """Assinatura indexada mais próxima de sig (dentro de max_distance) ou None."""
+        best, best_distance = None, self.max_distance + 1
+        for band in _bands(sig):
+            for other in self._buckets.get(band, ()):
+                distance = (sig ^ other).bit_count()
+                if distance < best_distance:
+                    best, best_distance = other, distance
+        return best
+
+    def get(self, sig: int):
+        if sig is None:
+            return None
+        with self._lock:
+            match = self.nearest(sig)
+            if match is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(match)
+            self.hits += 1
+            return self._items[match]
+
+    def put(self, sig: int, value):
+        if sig is None:
+            return
+        with self._lock:
+            if sig not in self._items:
+                for band in _bands(sig):
+                    self._buckets.setdefault(band, set()).add(sig)
+            self._items[sig] = value
+            self._items.move_to_end(sig)
+            while len(self._items) > self.max_items:
+                old, _ = self._items.popitem(last=False)
+                self.evictions += 1
+                for band in _bands(old):
+                    bucket = self._buckets.get(band)
+                    bucket.discard(old)
+                    if not bucket:
+                        del self._buckets[band]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_size": self.max_items,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "grouped": self.grouped,
+            }
+
+
+def cluster(signatures):
+    """
+    Agrupa as assinaturas de um lote: {índice: índice do representante}. O
+    primeiro texto de cada grupo é o representante; textos sem assinatura
+    ficam sozinhos.
+    """
+    reps = NearDuplicateIndex(max_items=len(signatures) or 1)
+    assigned = {}
+    for i, sig in enumerate(signatures):
+        rep = reps.get(sig)
+        if rep is None:
+            rep = i
+            reps.put(sig, i)
+        assigned[i] = rep
+    return assigned
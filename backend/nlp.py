@@ -1,22 +1,96 @@
+import json
+import os
 import re
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import ComplementNB
-from sklearn.pipeline import Pipeline
+import threading
+import time
+from typing import TYPE_CHECKING
 
-try:
-    nltk.data.find("corpora/stopwords")
-except LookupError:
-    nltk.download("stopwords")
+from metrics import logger
 
-PT_STOPWORDS = set(nltk.corpus.stopwords.words('portuguese'))
+# numpy/scikit-learn/joblib são importados no primeiro uso (treino, load ou
+# classificação), não no import do módulo: o processo sobe sem pagar por eles.
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.pipeline import Pipeline
+
+# --------- Artefato do modelo ----------
+# Incrementar MODEL_VERSION sempre que mudar dados de treino, pré-processamento
+# ou hiperparâmetros: artefatos de outra versão são ignorados no load.
+MODEL_VERSION = 2
+# "tfidf": TF-IDF + ComplementNB (vocabulário em dict, cresce com o corpus)
+# "hashing": HashingVectorizer de largura fixa + ComplementNB via partial_fit
+#            (memória constante, treino out-of-core em blocos)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "tfidf")
+HASHING_BITS = int(os.getenv("HASHING_BITS", "18"))  # 2**18 colunas
+CLASSES = ["Improdutivo", "Produtivo"]
+
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+
+
+def default_model_path(backend: str = MODEL_BACKEND) -> str:
+    name = f"nlp-v{MODEL_VERSION}.joblib" if backend == "tfidf" else f"nlp-{backend}-v{MODEL_VERSION}.joblib"
+    return os.path.join(MODEL_DIR, name)
+
+
+MODEL_PATH = os.getenv("MODEL_PATH", default_model_path())
+
+# Ponteiro da versão publicada pelo treino com feedback (feedback.py): um JSON
+# com a revisão e o artefato atual, trocado com os.replace depois que o artefato
+# já está inteiro no disco. Sem ponteiro vale MODEL_PATH; apagar o ponteiro
+# volta ao modelo base (ex.: depois de um train.py com dados novos).
+MODEL_POINTER = os.getenv(
+    "MODEL_POINTER", os.path.join(MODEL_DIR, f"current-{MODEL_BACKEND}-v{MODEL_VERSION}.json")
+)
+# Intervalo para conferir o ponteiro (0 desliga a troca a quente)
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "5"))
+
+# Lista de stopwords PT empacotada (a mesma do corpus "stopwords" do NLTK),
+# sem download em tempo de execução.
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords_pt.txt")
+
+# Preenchido pelo artefato (ou por load_stopwords() no treino)
+PT_STOPWORDS = set()
+
+# Limiar de confiança da cascata (cascade.py) calibrado para este modelo: as
+# probabilidades do NB ficam comprimidas perto de 0.5 e mudam a cada treino,
+# então um número fixo escala tudo ou nada. Gravado no artefato pelo train.py e
+# refeito a cada revisão do feedback: {"cascade_threshold", "escalation_rate",
+# "early_exit_threshold", "early_exit_rate"}. O early_exit_threshold é a
+# confiança que só a fração early_exit_rate dos textos atinge: com ela o
+# chunking.py para de classificar janelas de um documento longo.
+CALIBRATION = {}
+DEFAULT_ESCALATION_RATE = 0.25
+DEFAULT_EARLY_EXIT_RATE = 0.1
+# Artefato sem calibração: medido no modelo empacotado (metade de 2000 emails
+# sintéticos abaixo dele; 0.75 escalava 100%)
+DEFAULT_CASCADE_THRESHOLD = 0.55
+DEFAULT_EARLY_EXIT_THRESHOLD = 0.6  # idem: 10% dos emails sintéticos acima dele
+
+
+def load_stopwords(path: str = STOPWORDS_PATH):
+    """Stopwords PT da lista empacotada (uma por linha). Só é chamado no treino."""
+    with open(path, encoding="utf-8") as fh:
+        return {line.strip() for line in fh if line.strip()}
+
+# Uma única varredura: URLs casam a primeira alternativa (grupo vazio, descartadas);
+# o grupo 1 só pega sequências de 3+ letras, já sem dígitos/pontuação/underscore.
+_TOKEN_RE = re.compile(r'https?://\S+|www\.\S+|([^\W\d_]{3,})')
+
+
+def tokenize(txt: str, stopwords=None):
+    """
+    Tokenizer do TfidfVectorizer (o lowercase fica a cargo do próprio vetorizador):
+    pré-processamento e tokenização fundidos, sem montar e re-dividir uma string.
+    Sem stopwords, usa as do modelo carregado (PT_STOPWORDS).
+    """
+    if stopwords is None:
+        stopwords = PT_STOPWORDS
+    return [t for t in _TOKEN_RE.findall(txt) if t and t not in stopwords]
+
+
+def clean_text(txt: str, stopwords=None) -> str:
+    return ' '.join(tokenize(txt.lower(), stopwords))
 
-def clean_text(txt: str) -> str:
-    txt = txt.lower()
-    txt = re.sub(r'https?://\S+|www\.\S+', ' ', txt)
-    txt = re.sub(r'[\d\W_]+', ' ', txt, flags=re.UNICODE)
-    tokens = [t for t in txt.split() if t not in PT_STOPWORDS and len(t) > 2]
-    return ' '.join(tokens)
 
 X_train = [
     "preciso do status da solicitação 1234 anexo comprovante",
@@ -31,17 +105,284 @@ y_train = [
     "Improdutivo", "Improdutivo", "Improdutivo"
 ]
 
-model: Pipeline = Pipeline([
-    ('tfidf', TfidfVectorizer(preprocessor=clean_text, ngram_range=(1,2))),
-    ('clf', ComplementNB()) 
-])
 
-model.fit(X_train, y_train)
+def train_model(backend: str = MODEL_BACKEND) -> "Pipeline":
+    """Ajusta o backend escolhido nos exemplos de X_train."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import ComplementNB
+    from sklearn.pipeline import Pipeline
+
+    global PT_STOPWORDS
+    PT_STOPWORDS = load_stopwords()
+    if backend == "hashing":
+        return train_hashing_model([(X_train, y_train)])
+    if backend != "tfidf":
+        raise ValueError(f"backend desconhecido: {backend}")
+    pipeline = Pipeline([
+        ('tfidf', TfidfVectorizer(tokenizer=tokenize, token_pattern=None, ngram_range=(1,2))),
+        ('clf', ComplementNB())
+    ])
+    pipeline.fit(X_train, y_train)
+    return pipeline
+
+
+def hashing_vectorizer() -> "HashingVectorizer":
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    # alternate_sign=False mantém as features não negativas, como o NB exige
+    return HashingVectorizer(
+        tokenizer=tokenize, token_pattern=None, ngram_range=(1,2),
+        n_features=2 ** HASHING_BITS, alternate_sign=False,
+    )
+
+
+def train_hashing_model(batches, model: "Pipeline" = None) -> "Pipeline":
+    """
+    Treino incremental: cada (textos, rótulos) de batches passa por partial_fit.
+    O vetorizador não guarda estado, então a memória não depende do corpus.
+    Passe model para continuar o treino de um pipeline hashing existente.
+    """
+    from sklearn.naive_bayes import ComplementNB
+    from sklearn.pipeline import Pipeline
+
+    if model is None:
+        model = Pipeline([('hashing', hashing_vectorizer()), ('clf', ComplementNB())])
+    vectorizer, clf = model.named_steps['hashing'], model.named_steps['clf']
+    for texts, labels in batches:
+        clf.partial_fit(vectorizer.transform(texts), labels, classes=CLASSES)
+    return model
+
+
+def iter_labeled_chunks(path: str, chunk_size: int = 10000):
+    """Lê um JSONL ({"text": ..., "label": ...} por linha) em blocos de chunk_size."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            texts.append(row["text"])
+            labels.append(row["label"])
+            if len(texts) >= chunk_size:
+                yield texts, labels
+                texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def save_model(pipeline: "Pipeline", path: str = MODEL_PATH, backend: str = MODEL_BACKEND,
+               calibration: dict = None) -> str:
+    """
+    Grava o artefato versionado (vocabulário, IDF, pesos do NB, stopwords e o
+    calibração da cascata; sem calibration mantém a do modelo carregado).
+    Sem compressão, para que load_model possa mapear os arrays com mmap.
+    """
+    import joblib
+    import sklearn
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    artifact = {
+        "version": MODEL_VERSION,
+        "backend": backend,
+        "sklearn": sklearn.__version__,
+        "stopwords": sorted(PT_STOPWORDS),
+        "calibration": dict(calibration if calibration is not None else CALIBRATION),
+        "pipeline": pipeline,
+    }
+    tmp_path = f"{path}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_model(path: str = MODEL_PATH, mmap_mode: str = "r") -> "Pipeline":
+    """
+    Abre o artefato com mmap_mode="r": os arrays (IDF, feature_log_prob_) ficam
+    no page cache e são compartilhados entre workers que abrem o mesmo arquivo.
+    mmap_mode=None devolve uma cópia gravável (para continuar o treino).
+    """
+    import joblib
+    import sklearn
+
+    global PT_STOPWORDS, CALIBRATION
+    artifact = joblib.load(path, mmap_mode=mmap_mode)
+    if artifact.get("version") != MODEL_VERSION:
+        raise ValueError(f"artefato versão {artifact.get('version')}, esperado {MODEL_VERSION}")
+    if artifact.get("backend", "tfidf") != MODEL_BACKEND:
+        raise ValueError(f"artefato do backend {artifact.get('backend')}, esperado {MODEL_BACKEND}")
+    if artifact.get("sklearn") != sklearn.__version__:
+        logger.warning("Artefato gerado com scikit-learn %s (instalado: %s)", artifact.get("sklearn"), sklearn.__version__)
+    PT_STOPWORDS = set(artifact["stopwords"])
+    CALIBRATION = artifact.get("calibration") or {}
+    return artifact["pipeline"]
+
+
+def calibrate(pipeline: "Pipeline", texts, escalation_rate: float = None, early_exit_rate: float = None) -> dict:
+    """
+    Calibração de pipeline em texts (quantis da confiança): a cascata escala a
+    fração escalation_rate e a saída antecipada vale para a fração
+    early_exit_rate mais confiante. Sem textos só guarda as taxas, para a
+    próxima revisão.
+    """
+    import numpy as np
+
+    if escalation_rate is None:
+        escalation_rate = CALIBRATION.get("escalation_rate", DEFAULT_ESCALATION_RATE)
+    if early_exit_rate is None:
+        early_exit_rate = CALIBRATION.get("early_exit_rate", DEFAULT_EARLY_EXIT_RATE)
+    calibration = {"escalation_rate": escalation_rate, "early_exit_rate": early_exit_rate}
+    texts = list(texts)
+    if texts:
+        confidences = pipeline.predict_proba(texts).max(axis=1)
+        calibration["cascade_threshold"] = round(float(np.quantile(confidences, escalation_rate)), 4)
+        calibration["early_exit_threshold"] = round(float(np.quantile(confidences, 1 - early_exit_rate)), 4)
+    return calibration
+
+
+def cascade_threshold() -> float:
+    """Limiar calibrado do modelo carregado (ou DEFAULT_CASCADE_THRESHOLD)."""
+    return CALIBRATION.get("cascade_threshold", DEFAULT_CASCADE_THRESHOLD)
+
+
+def early_exit_threshold() -> float:
+    """Confiança de saída antecipada calibrada do modelo carregado (ou DEFAULT_EARLY_EXIT_THRESHOLD)."""
+    return CALIBRATION.get("early_exit_threshold", DEFAULT_EARLY_EXIT_THRESHOLD)
+
+
+def update_model(pipeline: "Pipeline", texts, labels) -> "Pipeline":
+    """
+    Warm start: partial_fit do ComplementNB com o vetorizador já ajustado. No
+    TF-IDF o vocabulário fica fixo (palavras novas são ignoradas); no hashing
+    todas as features entram. O pipeline precisa ser gravável (sem mmap).
+    """
+    vectorizer, clf = pipeline.steps[0][1], pipeline.steps[-1][1]
+    clf.partial_fit(vectorizer.transform(texts), labels, classes=CLASSES)
+    return pipeline
+
+
+def read_pointer(path: str = MODEL_POINTER):
+    """Conteúdo do ponteiro de versão ou None (sem treino publicado ainda)."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def revision_path(revision: int) -> str:
+    root, ext = os.path.splitext(MODEL_PATH)
+    return f"{root}-r{revision}{ext}"
+
+
+def publish_model(pipeline: "Pipeline", revision: int, calibration: dict = None, **meta) -> str:
+    """
+    Grava o artefato da revisão (arquivo novo, nunca sobrescrito) e só então
+    troca o ponteiro com os.replace: quem lê o ponteiro vê a revisão anterior
+    ou a nova, nunca um artefato pela metade.
+    """
+    path = save_model(pipeline, revision_path(revision), calibration=calibration)
+    pointer = {"revision": revision, "path": os.path.relpath(path, os.path.dirname(MODEL_POINTER)), "published_at": time.time(), **meta}
+    tmp_path = f"{MODEL_POINTER}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(pointer, fh)
+    os.replace(tmp_path, MODEL_POINTER)
+    return path
+
+
+def load_current(mmap_mode: str = "r"):
+    """(revisão, pipeline) apontados pelo ponteiro; revisão 0 é MODEL_PATH."""
+    pointer = read_pointer()
+    if pointer is None:
+        return 0, load_model(MODEL_PATH, mmap_mode)
+    path = os.path.join(os.path.dirname(MODEL_POINTER), pointer["path"])
+    return pointer["revision"], load_model(path, mmap_mode)
+
+
+_model = None
+_model_revision = 0
+_model_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_next_poll = 0.0
+
+
+def get_model() -> "Pipeline":
+    """Carrega o modelo no primeiro uso; sem artefato válido, treina em memória."""
+    global _model, _model_revision
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model_revision, _model = load_current()
+                except Exception as e:
+                    logger.warning("Artefato indisponível (%s); treinando em memória", e)
+                    _model = train_model()
+    else:
+        _maybe_poll()
+    return _model
+
+
+def model_revision() -> int:
+    return _model_revision
+
+
+def reload_model():
+    """
+    Troca o modelo se o ponteiro mudou. O artefato novo é aberto antes e a
+    troca é uma atribuição: quem já pegou o pipeline antigo termina com ele.
+    Devolve a nova revisão ou None.
+    """
+    global _model, _model_revision
+    if _model is None or not _reload_lock.acquire(blocking=False):
+        return None
+    try:
+        pointer = read_pointer()
+        revision = pointer["revision"] if pointer else 0
+        if revision == _model_revision:
+            return None
+        revision, pipeline = load_current()
+        with _model_lock:
+            _model, _model_revision = pipeline, revision
+        logger.info("Modelo trocado para a revisão %d", revision)
+        return revision
+    except Exception as e:
+        logger.exception("Falha ao trocar o modelo: %s", e)
+        return None
+    finally:
+        _reload_lock.release()
+
+
+def _maybe_poll():
+    """
+    Confere o ponteiro a cada MODEL_POLL_SECONDS numa thread à parte (vale
+    também para os processos do pool de executor.py): a requisição que
+    dispara a conferência não espera o load.
+    """
+    global _next_poll
+    now = time.monotonic()
+    if MODEL_POLL_SECONDS <= 0 or now < _next_poll:
+        return
+    _next_poll = now + MODEL_POLL_SECONDS
+    threading.Thread(target=reload_model, daemon=True).start()
+
+
+def classify_batch(texts):
+    """
+    Classifica vários textos numa única passada: TF-IDF gera uma matriz esparsa
+    para o lote todo e o rótulo vem do argmax de predict_proba (mesmo resultado
+    de model.predict, sem rodar o pipeline duas vezes).
+    """
+    import numpy as np
+
+    texts = list(texts)
+    if not texts:
+        return []
+    model = get_model()
+    proba = model.predict_proba(texts)
+    idx = proba.argmax(axis=1)
+    labels = model.classes_[idx]
+    confidences = proba[np.arange(len(texts)), idx]
+    return [(str(lbl), float(conf)) for lbl, conf in zip(labels, confidences)]
+
 
 def classify(text: str):
-    proba = model.predict_proba([text])[0]
-    label = model.predict([text])[0]
-    # probas na ordem model.classes_
-    label2idx = {lbl: i for i, lbl in enumerate(model.classes_)}
-    confidence = float(proba[label2idx[label]])
-    return label, confidence
+    return classify_batch([text])[0]
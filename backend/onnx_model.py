@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+
+# --------- Config ONNX (opcional) ----------
+# Transformer multilíngue local (NLI, quantizado int8) rodando em CPU via
+# ONNX Runtime. Gere o modelo com export_onnx.py.
+USE_ONNX = os.getenv("USE_ONNX") == "1"
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "onnx")
+)
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model_quantized.onnx")
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = ONNX Runtime decide
+ONNX_MAX_LENGTH = int(os.getenv("ONNX_MAX_LENGTH", "256"))  # tokens por par (texto, hipótese)
+ONNX_MAX_BATCH = int(os.getenv("ONNX_MAX_BATCH", "32"))  # pares por session.run
+
+# Buckets de comprimento: cada lote é preenchido só até o bucket dos seus textos,
+# não até o mais longo da requisição.
+LENGTH_BUCKETS = tuple(b for b in (32, 64, 128, 256, 512) if b < ONNX_MAX_LENGTH) + (ONNX_MAX_LENGTH,)
+
+# Zero-shot via NLI: cada rótulo vira uma hipótese; vence a de maior entailment.
+HYPOTHESES = {
+    "Produtivo": "Este email pede uma ação, resposta ou atualização da equipe.",
+    "Improdutivo": "Este email não exige nenhuma ação da equipe.",
+}
+LABELS = tuple(HYPOTHESES)
+
+_session = None
+_tokenizer = None
+_entailment_idx = 0
+_input_names = ()
+_pad_id = 0
+_lock = threading.Lock()
+
+
+def load_session():
+    """Abre sessão + tokenizer uma única vez por processo (compartilhados pelas threads)."""
+    global _session, _tokenizer, _entailment_idx, _input_names, _pad_id
+    if _session is not None:
+        return _session
+    with _lock:
+        if _session is None:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if ONNX_THREADS:
+                options.intra_op_num_threads = ONNX_THREADS
+            session = ort.InferenceSession(
+                os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+            )
+
+            tokenizer = Tokenizer.from_file(os.path.join(ONNX_MODEL_DIR, "tokenizer.json"))
+            tokenizer.no_padding()
+            tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH, strategy="only_first")
+            for token in ("<pad>", "[PAD]"):
+                if tokenizer.token_to_id(token) is not None:
+                    _pad_id = tokenizer.token_to_id(token)
+                    break
+
+            with open(os.path.join(ONNX_MODEL_DIR, "config.json"), encoding="utf-8") as fh:
+                label2id = {k.lower(): v for k, v in json.load(fh).get("label2id", {}).items()}
+            _entailment_idx = label2id.get("entailment", 0)
+            _input_names = tuple(i.name for i in session.get_inputs())
+            _tokenizer = tokenizer
+            _session = session
+    return _session
+
+
+def _bucket(length: int) -> int:
+    for size in LENGTH_BUCKETS:
+        if length <= size:
+            return size
+    return LENGTH_BUCKETS[-1]
+
+
+def _entailment_logits(encodings):
+    """Roda os pares agrupados por bucket de comprimento, em lotes de ONNX_MAX_BATCH."""
+    import numpy as np
+
+    logits = np.empty(len(encodings), dtype=np.float32)
+    order = sorted(range(len(encodings)), key=lambda i: len(encodings[i].ids))
+    start = 0
+    while start < len(order):
+        size = _bucket(len(encodings[order[start]].ids))
+        end = start
+        while end < len(order) and end - start < ONNX_MAX_BATCH and _bucket(len(encodings[order[end]].ids)) == size:
+            end += 1
+        chunk = order[start:end]
+
+        input_ids = np.full((len(chunk), size), _pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(chunk), size), dtype=np.int64)
+        token_type_ids = np.zeros((len(chunk), size), dtype=np.int64)
+        for row, i in enumerate(chunk):
+            enc = encodings[i]
+            n = len(enc.ids)
+            input_ids[row, :n] = enc.ids
+            attention_mask[row, :n] = 1
+            token_type_ids[row, :n] = enc.type_ids
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": token_type_ids}
+        output = _session.run(None, {name: feeds[name] for name in _input_names})[0]
+        logits[chunk] = output[:, _entailment_idx]
+        start = end
+    return logits
+
+
+def classify_batch(texts):
+    """Mesma interface de nlp.classify_batch: [(rótulo, confiança)] na ordem de entrada."""
+    texts = list(texts)
+    if not texts:
+        return []
+    import numpy as np
+
+    load_session()
+    pairs = [(text, HYPOTHESES[label]) for text in texts for label in LABELS]
+    scores = _entailment_logits(_tokenizer.encode_batch(pairs)).reshape(len(texts), len(LABELS))
+    scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+    proba = scores / scores.sum(axis=1, keepdims=True)
+    idx = proba.argmax(axis=1)
+    return [(LABELS[i], float(proba[row, i])) for row, i in enumerate(idx)]
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import logger, timed
+
+# --------- Config extração de PDF ----------
+# Pool de processos limitado: pdfminer é CPU-bound e não pode rodar no event loop.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Orçamento por PDF: para de ler páginas quando já há texto suficiente para classificar.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "20000"))
+# Tempo máximo de extração por arquivo; estourou, o worker travado é descartado
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "30"))
+
+SPOOL_CHUNK = 1024 * 1024
+
+_pool = None
+_generation = 0
+_terminated = set()  # gerações encerradas de propósito (timeout)
+pool_stats = {"timeouts": 0, "restarts": 0}
+
+
+class PdfError(Exception):
+    pass
+
+
+def extract_pdf_path(path: str, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS) -> str:
+    """
+    Extrai o texto página a página (extract_pages é um gerador) e para assim que
+    atingir max_pages ou max_chars. Roda dentro do pool de processos
+    (o pdfminer só é importado lá, não no processo da API).
+    """
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    parts = []
+    total = 0
+    for page in extract_pages(path, maxpages=max_pages):
+        for element in page:
+            if isinstance(element, LTTextContainer):
+                chunk = element.get_text()
+                parts.append(chunk)
+                total += len(chunk)
+        if total >= max_chars:
+            break
+    return "".join(parts)[:max_chars]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    return _current_pool()[0]
+
+
+def _current_pool():
+    """(pool, geração); a geração sobe a cada pool criado."""
+    global _pool, _generation
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        _generation += 1
+    return _pool, _generation
+
+
+def _terminate(pool: ProcessPoolExecutor):
+    """Encerra os processos do pool (shutdown não interrompe tarefa em andamento)."""
+    if not hasattr(pool, "_processes"):  # interno do ProcessPoolExecutor
+        logger.warning("ProcessPoolExecutor sem _processes: o worker travado segue até terminar sozinho")
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    # sem cancel_futures: o que estava na fila recebe BrokenProcessPool (e tenta
+    # de novo) em vez de um CancelledError indistinguível de cancelamento real
+    pool.shutdown(wait=False)
+
+
+def _discard_pool(pool: ProcessPoolExecutor, generation: int, terminate: bool = False):
+    """
+    Tira do ar um pool quebrado (worker morreu) ou com worker travado; o
+    próximo get_pool cria outro. Com terminate os processos são encerrados e a
+    geração fica marcada: quem ainda esperava nela recebe BrokenProcessPool e
+    tenta de novo sem contar como falha do próprio arquivo.
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool_stats["restarts"] += 1
+    if terminate:
+        _terminated.add(generation)
+        _terminate(pool)
+    else:
+        pool.shutdown(wait=False)
+
+
+def _timeout_error():
+    pool_stats["timeouts"] += 1
+    return PdfError(f"tempo limite de {PDF_TIMEOUT:g} s excedido na extração")
+
+
+async def _extract_in_pool(path: str) -> str:
+    loop = asyncio.get_running_loop()
+    while True:
+        pool, generation = _current_pool()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, extract_pdf_path, path), PDF_TIMEOUT)
+        except asyncio.TimeoutError:
+            _discard_pool(pool, generation, terminate=True)
+            raise _timeout_error()
+        except BrokenProcessPool:
+            _discard_pool(pool, generation)
+            if generation not in _terminated:
+                break  # um worker morreu: pode ter sido este arquivo ou outro do pool
+            # senão foi derrubado pelo timeout de outro arquivo: tenta de novo
+    # nova tentativa num processo só deste arquivo: se cair de novo, a culpa é dele
+    isolated = ProcessPoolExecutor(max_workers=1)
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(isolated, extract_pdf_path, path), PDF_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _timeout_error()
+    except BrokenProcessPool:
+        raise PdfError("o processo de extração caiu ao ler este PDF")
+    finally:
+        _terminate(isolated)
+
+
+def shutdown_pool(wait: bool = False):
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=not wait)
+        _pool = None
+
+
+def _spool_to_disk(src, suffix: str) -> str:
+    """Copia o upload em blocos para um arquivo temporário (sem materializar em bytes)."""
+    src.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as dst:
+        shutil.copyfileobj(src, dst, SPOOL_CHUNK)
+        return dst.name
+
+
+async def extract_pdf(upload) -> str:
+    """Grava o UploadFile em disco e extrai o texto no pool, sem bloquear o event loop."""
+    return await extract_pdf_fileobj(upload.file)
+
+
+async def extract_pdf_fileobj(src) -> str:
+    """Idem para qualquer arquivo binário com seek (ex.: anexo de email em BytesIO)."""
+    with timed("pdf_extract"):
+        path = await asyncio.to_thread(_spool_to_disk, src, ".pdf")
+        try:
+            return await _extract_in_pool(path)
+        finally:
+            os.unlink(path)
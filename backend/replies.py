@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from nlp import clean_text, load_stopwords
+from templates import REPLY_TEMPLATES
+
+# --------- Config respostas ----------
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "5000"))  # respostas geradas em memória (LRU)
+MAX_ATTACHMENT_NAMES = 3
+# stopwords da chave semântica: lista empacotada, independente do modelo carregado
+STOPWORDS = frozenset(load_stopwords())
+
+# muda sempre que os templates mudam (entra no namespace do cache de resultados)
+TEMPLATES_FINGERPRINT = hashlib.sha1(
+    json.dumps(REPLY_TEMPLATES, sort_keys=True).encode("utf-8")
+).hexdigest()[:12]
+
+# --------- Extração de slots ----------
+# Protocolo: palavra-chave seguida de um identificador com pelo menos um dígito.
+_PROTOCOL_RE = re.compile(
+    r"\b(?:protocolo|chamado|ticket|pedido|solicita[çc][ãa]o)\b\s*(?:n[º°o.]*|n[úu]mero|#|:|-|\s)*"
+    r"(?=[\w\-/.]*\d)([A-Z0-9][\w\-/.]*[A-Z0-9])",
+    re.IGNORECASE,
+)
+_DEADLINE_RE = re.compile(
+    r"\b(?:até|ate|prazo(?:\s+(?:de|é|até))?:?|vence(?:ndo)?(?:\s+em)?|dentro\s+de|em)\s+"
+    r"(?:o\s+dia\s+|dia\s+|a\s+|o\s+)?"
+    r"(\d{1,2}/\d{1,2}(?:/\d{2,4})?|amanhã|amanha|hoje"
+    r"|(?:segunda|terça|terca|quarta|quinta|sexta)(?:-feira)?|sábado|sabado"
+    r"|fim\s+do\s+(?:dia|mês|mes)|\d+\s+dias(?:\s+úteis|\s+uteis)?)\b",
+    re.IGNORECASE,
+)
+_ATTACHMENT_FILE_RE = re.compile(r"\b[\w\-]+(?:\.[\w\-]+)*\.(?:pdf|docx?|xlsx?|csv|txt|png|jpe?g|zip|xml)\b", re.IGNORECASE)
+_ATTACHMENT_RE = re.compile(r"\b(?:em\s+anexo|anex(?:o|os|ei|ado|ados|ada|adas|amos))\b", re.IGNORECASE)
+
+
+def extract_slots(text: str) -> dict:
+    """{slot: valor} só para os slots encontrados no email (protocol, deadline, attachments)."""
+    slots = {}
+    m = _PROTOCOL_RE.search(text)
+    if m:
+        slots["protocol"] = m.group(1)
+    m = _DEADLINE_RE.search(text)
+    if m:
+        slots["deadline"] = " ".join(m.group(1).split())
+    names = list(dict.fromkeys(_ATTACHMENT_FILE_RE.findall(text)))[:MAX_ATTACHMENT_NAMES]
+    if names:
+        listed = names[0] if len(names) == 1 else ", ".join(names[:-1]) + " e " + names[-1]
+        slots["attachments"] = f"o arquivo {listed}" if len(names) == 1 else f"os arquivos {listed}"
+    elif _ATTACHMENT_RE.search(text):
+        slots["attachments"] = "o anexo enviado"
+    return slots
+
+
+def render_reply(category: str, slots: dict) -> str:
+    """Monta a resposta da biblioteca de templates com os slots extraídos."""
+    parts = REPLY_TEMPLATES.get(category, REPLY_TEMPLATES["Improdutivo"])
+    sentences = [parts["opening"]]
+    if "protocol" in slots:
+        sentences.append(parts["protocol"])
+    if "deadline" in slots and "deadline" in parts:
+        sentences.append(parts["deadline"])
+    elif "no_deadline" in parts:
+        sentences.append(parts["no_deadline"])
+    if "attachments" in slots:
+        sentences.append(parts["attachments"])
+    if "missing" in parts and "protocol" not in slots and "attachments" not in slots:
+        sentences.append(parts["missing"])
+    if "closing" in parts:
+        sentences.append(parts["closing"])
+    return " ".join(sentences).format(**slots)
+
+
+def to_template(reply: str, slots: dict) -> str:
+    """Resposta com os valores dos slots trocados por {slot} (chaves literais escapadas)."""
+    template = reply.replace("{", "{{").replace("}", "}}")
+    for name, value in slots.items():
+        template = template.replace(value, "{" + name + "}")
+    return template
+
+
+def retarget(reply: str, old_slots: dict, new_slots: dict):
+    """
+    Adapta a resposta de um email para outro quase idêntico trocando os valores
+    dos slots; None se os dois não têm os mesmos slots (aí o template é refeito).
+    """
+    if set(old_slots) != set(new_slots):
+        return None
+    return to_template(reply, old_slots).format(**new_slots)
+
+
+def _mask_slots(text: str) -> str:
+    for regex in (_PROTOCOL_RE, _DEADLINE_RE, _ATTACHMENT_FILE_RE):
+        text = regex.sub(" ", text)
+    return text
+
+
+class ReplyEngine:
+    """
+    Respostas por template (modo local) ou geradas (HF) com cache semântico.
+    A chave é categoria + slots presentes + o conjunto de tokens de clean_text
+    do email sem os valores dos slots: emails que só diferem em protocolo, data,
+    nome de anexo ou ordem das palavras compartilham a mesma resposta gerada.
+    A resposta é guardada com os valores trocados por {slot} e preenchida de
+    novo para cada email; o gerador só é chamado quando a chave não está no cache.
+    """
+
+    def __init__(self, namespace: str, max_items: int = REPLY_CACHE_SIZE):
+        self.namespace = namespace
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}  # chave -> Task de geração em andamento
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.uncacheable = 0
+
+    def key(self, category: str, text: str, slots: dict) -> str:
+        tokens = " ".join(sorted(set(clean_text(_mask_slots(text), STOPWORDS).split())))
+        raw = f"{self.namespace}\0{category}\0{','.join(sorted(slots))}\0{tokens}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def render(self, category: str, text: str) -> str:
+        return render_reply(category, extract_slots(text))
+
+    async def suggest(self, category: str, text: str, generate, prompt_text: str = None) -> str:
+        """
+        Resposta via generate(category, text, fallback=False) com cache semântico.
+        Sem resposta gerada (erro/timeout), cai no template com os mesmos slots.
+        prompt_text substitui o texto enviado ao gerador (ex.: a janela decisiva
+        de um documento longo); slots e chave continuam vindo do texto inteiro.
+        """
+        slots = extract_slots(text)
+        key = self.key(category, text, slots)
+        with self._lock:
+            template = self._items.get(key)
+            if template is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return template.format(**slots)
+            self.misses += 1
+
+        # emails equivalentes ao mesmo tempo (ex.: um upload com vários) geram uma vez só
+        task = self._inflight.get(key)
+        owner = task is None
+        if owner:
+            task = asyncio.ensure_future(self._generate(key, category, prompt_text or text, slots, generate))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        reply, template = await asyncio.shield(task)
+        if owner and reply:
+            return reply
+        if template is not None:
+            return template.format(**slots)
+        return render_reply(category, slots)
+
+    async def _generate(self, key: str, category: str, text: str, slots: dict, generate):
+        reply = await generate(category, text, fallback=False)
+        if not reply:
+            return None, None
+        self.generated += 1
+        template = to_template(reply, slots)
+        # dígitos que sobraram são dados deste email (outro protocolo/data): não reaproveita
+        if re.search(r"\d", template):
+            self.uncacheable += 1
+            return reply, None
+        with self._lock:
+            self._items[key] = template
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return reply, template
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "max_size": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "uncacheable": self.uncacheable,
+            }
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+
+from metrics import logger
+
+# --------- Config resiliência do caminho remoto ----------
+# Orçamento de tempo de ponta a ponta por requisição (por item no bulk) para as
+# chamadas à HF. A classificação pode gastar até HF_CLASSIFY_SHARE do que
+# restar; a geração usa o resto. Sem tempo suficiente, vale o fallback local.
+HF_DEADLINE = float(os.getenv("HF_DEADLINE", "20"))
+HF_CLASSIFY_SHARE = float(os.getenv("HF_CLASSIFY_SHARE", "0.5"))
+HF_MIN_TIMEOUT = float(os.getenv("HF_MIN_TIMEOUT", "0.25"))  # abaixo disso nem chama
+# Circuit breaker: abre depois de N falhas seguidas; após o cooldown deixa
+# passar uma única chamada de teste (half-open) antes de fechar de novo.
+HF_BREAKER_FAILURES = int(os.getenv("HF_BREAKER_FAILURES", "5"))
+HF_BREAKER_COOLDOWN = float(os.getenv("HF_BREAKER_COOLDOWN", "30"))
+# Hedging: sem resposta em HF_HEDGE_AFTER segundos, manda uma segunda cópia e
+# fica com a primeira que responder (0 desliga; dobra o custo só na cauda).
+HF_HEDGE_AFTER = float(os.getenv("HF_HEDGE_AFTER", "0"))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Budget:
+    """Prazo absoluto da requisição; degraded marca que algum fallback foi usado."""
+
+    def __init__(self, seconds: float = HF_DEADLINE):
+        self.deadline = time.monotonic() + seconds
+        self.degraded = False
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+_budget = ContextVar("remote_budget", default=None)
+deadline_stats = {"exceeded": 0, "degraded": 0}
+
+
+def start_budget(seconds: float = HF_DEADLINE) -> Budget:
+    """Abre o orçamento da requisição atual (vale para as tasks filhas)."""
+    budget = Budget(seconds)
+    _budget.set(budget)
+    return budget
+
+
+def current_budget():
+    return _budget.get()
+
+
+def stage_timeout(cap: float, share: float = 1.0) -> float:
+    """
+    Timeout de uma etapa: o menor entre cap e share do orçamento restante.
+    DeadlineExceeded se o que sobra não paga nem HF_MIN_TIMEOUT.
+    """
+    budget = _budget.get()
+    if budget is None:
+        return cap
+    timeout = min(cap, budget.remaining() * share)
+    if timeout < HF_MIN_TIMEOUT:
+        deadline_stats["exceeded"] += 1
+        raise DeadlineExceeded(f"orçamento esgotado ({budget.remaining():.2f}s restantes)")
+    return timeout
+
+
+def mark_degraded():
+    budget = _budget.get()
+    if budget is not None and not budget.degraded:
+        budget.degraded = True
+        deadline_stats["degraded"] += 1
+
+
+class CircuitBreaker:
+    """
+    closed -> open depois de max_failures falhas seguidas; open rejeita na hora
+    (CircuitOpen) até passar cooldown; então half_open deixa uma chamada de
+    teste: sucesso fecha, falha reabre. is_failure decide o que conta como
+    falha do serviço (ex.: 4xx de entrada inválida não conta).
+    """
+
+    def __init__(self, name: str, max_failures: int = HF_BREAKER_FAILURES,
+                 cooldown: float = HF_BREAKER_COOLDOWN, is_failure=lambda e: True):
+        self.name = name
+        self.max_failures = max(1, max_failures)
+        self.cooldown = cooldown
+        self.is_failure = is_failure
+        self.state = "closed"
+        self.failures = 0  # seguidas
+        self.opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+        self.short_circuits = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.short_circuits += 1
+        return False
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        if self.state != "closed":
+            logger.info("Circuito %s fechado", self.name)
+        self.state = "closed"
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.max_failures:
+            if self.state != "open":
+                self.opens += 1
+                logger.warning("Circuito %s aberto após %d falha(s)", self.name, self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    async def call(self, fn, *args):
+        """fn(*args) contabilizado; CircuitOpen sem chamar se o circuito não deixa passar."""
+        if not self.allow():
+            raise CircuitOpen(f"circuito {self.name} aberto")
+        try:
+            result = await fn(*args)
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "short_circuits": self.short_circuits,
+        }
+
+
+class Hedge:
+    """
+    Chamadas idempotentes com uma cópia extra se a primeira passar de after
+    segundos; vence a primeira que responder sem erro e a outra é cancelada.
+    """
+
+    def __init__(self, after: float = HF_HEDGE_AFTER):
+        self.after = after
+        self.sent = 0
+        self.won = 0  # a cópia respondeu antes da original
+
+    async def call(self, fn, *args):
+        if self.after <= 0:
+            return await fn(*args)
+        first = asyncio.ensure_future(fn(*args))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.after)
+            if done:
+                return first.result()
+            self.sent += 1
+            second = asyncio.ensure_future(fn(*args))
+            tasks.append(second)
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # inclusive quando quem chama é cancelado (timeout do orçamento):
+            # cópia órfã seguraria a vaga do host até o timeout do httpx
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {"after": self.after, "sent": self.sent, "won": self.won}
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+# --------- Regras de curto-circuito (saudações, fora do escritório, ...) ----------
+RULES_PATH = os.getenv("RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+
+
+class Rule:
+    def __init__(self, name: str, category: str, confidence: float, patterns):
+        self.name = name
+        self.category = category
+        self.confidence = float(confidence)
+        self.patterns = list(patterns)
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.category!r})"
+
+
+class RuleEngine:
+    """
+    Pré-filtro de uma passada + regex só das candidatas. Cada padrão é
+    reduzido a um literal obrigatório (ver required_literal): palavra inteira
+    vai para um índice palavra -> padrões, consultado com o conjunto de
+    palavras do texto (uma varredura, custo que não cresce com o número de
+    regras); trecho de palavra vira um teste de substring; padrão sem literal
+    roda sempre. A regex de cada candidata confirma, na ordem das regras.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.fired = Counter()
+        # muda sempre que o conjunto de regras muda (entra no namespace do cache)
+        self.fingerprint = hashlib.sha1(
+            json.dumps([(r.name, r.category, r.confidence, r.patterns) for r in self.rules]).encode("utf-8")
+        ).hexdigest()[:12]
+        self._patterns = []  # (regex compilada, índice da regra), na ordem das regras
+        self._by_word = {}  # palavra -> índices em _patterns
+        self._by_substring = []  # (trecho, índice)
+        self._always = []
+        for r, rule in enumerate(self.rules):
+            for pattern in rule.patterns:
+                i = len(self._patterns)
+                self._patterns.append((re.compile(pattern, re.IGNORECASE), r))
+                kind, literal = required_literal(pattern)
+                if kind == "word":
+                    self._by_word.setdefault(literal, []).append(i)
+                elif kind == "substring":
+                    self._by_substring.append((literal, i))
+                else:
+                    self._always.append(i)
+        self._words = self._by_word.keys()
+
+    def find(self, text: str):
+        """Primeira regra (na ordem do arquivo) que casa no texto, ou None, sem contar disparos."""
+        if not self._patterns or not text:
+            return None
+        lowered = text.lower()
+        candidates = list(self._always)
+        for word in self._words & set(_WORD_RE.findall(lowered)):
+            candidates.extend(self._by_word[word])
+        candidates.extend(i for literal, i in self._by_substring if literal in lowered)
+        for i in sorted(candidates):
+            regex, r = self._patterns[i]
+            if regex.search(text):
+                return self.rules[r]
+        return None
+
+    def find_many(self, texts):
+        """find para vários textos numa chamada (para rodar fora do event loop)."""
+        return [self.find(text) for text in texts]
+
+    def record(self, rule):
+        self.fired[rule.name] += 1
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules),
+            "indexed_patterns": sum(len(v) for v in self._by_word.values()),
+            "unindexed_patterns": len(self._always),
+            "fired": dict(self.fired),
+        }
+
+
+_WORD_RE = re.compile(r"\w+")
+_MIN_SUBSTRING = 3
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _flatten(items):
+    """
+    Sequência de 'lit' (caractere), 'sep' (garante fronteira de palavra: \\b,
+    \\s, \\s+, início/fim) e 'other' (qualquer outra coisa) do padrão parseado.
+    Grupos obrigatórios são abertos; alternativas e repetições opcionais viram 'other'.
+    """
+    out = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            ch = chr(av).lower()
+            out.append(("lit", ch) if _is_word_char(ch) else ("sep", ch))
+        elif op is sre_constants.SUBPATTERN:
+            out.extend(_flatten(av[-1]))
+        elif op is sre_constants.AT and av is not sre_constants.AT_NON_BOUNDARY:
+            out.append(("sep", None))
+        elif op is sre_constants.IN and _is_space(av):
+            out.append(("sep", None))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1 \
+                and len(av[2]) == 1 and av[2][0][0] is sre_constants.IN and _is_space(av[2][0][1]):
+            out.append(("sep", None))
+        else:
+            out.append(("other", None))
+    return out
+
+
+def _is_space(av) -> bool:
+    return av == [(sre_constants.CATEGORY, sre_constants.CATEGORY_SPACE)]
+
+
+def required_literal(pattern: str):
+    """
+    ("word", w) se toda ocorrência do padrão contém w como palavra inteira;
+    ("substring", s) se contém só o trecho s; (None, None) se nada é obrigatório.
+    """
+    items = _flatten(sre_parse.parse(pattern, re.IGNORECASE))
+    best_word = best_sub = ""
+    i = 0
+    while i < len(items):
+        if items[i][0] != "lit":
+            i += 1
+            continue
+        j = i
+        while j < len(items) and items[j][0] == "lit":
+            j += 1
+        run = "".join(ch for _, ch in items[i:j])
+        # só é palavra inteira com fronteira garantida dos dois lados
+        bounded = i > 0 and items[i - 1][0] == "sep" and j < len(items) and items[j][0] == "sep"
+        if bounded and len(run) > len(best_word):
+            best_word = run
+        elif len(run) > len(best_sub):
+            best_sub = run
+        i = j
+    if best_word:
+        return "word", best_word
+    if len(best_sub) >= _MIN_SUBSTRING:
+        return "substring", best_sub
+    return None, None
+
+
+def load_rules(path: str = RULES_PATH, section: str = "rules"):
+    """
+    Lê {"rules": [{"name", "category", "confidence", "patterns": [...]}, ...]}.
+    section="escalate" lê as regiões sinalizadas da cascata (só name e patterns).
+    """
+    with open(path, encoding="utf-8") as fh:
+        config = json.load(fh)
+    return [
+        Rule(r["name"], r.get("category"), r.get("confidence", 0.95), r["patterns"])
+        for r in config.get(section, [])
+    ]
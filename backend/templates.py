@@ -4,3 +4,26 @@ Se houver algum anexo relevante ou número de protocolo, por favor responda a es
 
 NON_PRODUCTIVE_REPLY = """Olá! Obrigado pela sua mensagem. Não é necessário nenhuma ação da nossa equipe neste momento. \
 Se precisar de algo específico, basta responder este email com mais detalhes que ficaremos felizes em ajudar."""
+
+# --------- Templates com slots (replies.py) ----------
+# Cada categoria: abertura + frases opcionais, usadas só quando o slot foi
+# extraído do email ("missing" só entra sem protocolo nem anexo); sem nenhum
+# slot o resultado é igual à resposta fixa acima.
+# Slots: {protocol}, {deadline}, {attachments}.
+REPLY_TEMPLATES = {
+    "Produtivo": {
+        "opening": "Olá! Recebemos sua solicitação e já registramos internamente.",
+        "protocol": "Ela segue vinculada ao protocolo {protocol}.",
+        "deadline": "Nossa equipe verificará o status e retornará com uma atualização dentro do prazo informado ({deadline}).",
+        "no_deadline": "Nossa equipe verificará o status e retornará com uma atualização até o próximo dia útil.",
+        "attachments": "Recebemos também {attachments} e já encaminhamos para análise.",
+        "missing": "Se houver algum anexo relevante ou número de protocolo, por favor responda a este email com essas informações.",
+    },
+    "Improdutivo": {
+        "opening": "Olá! Obrigado pela sua mensagem.",
+        "protocol": "Registramos a referência ao protocolo {protocol}.",
+        "attachments": "Recebemos {attachments}.",
+        "closing": "Não é necessário nenhuma ação da nossa equipe neste momento. "
+                   "Se precisar de algo específico, basta responder este email com mais detalhes que ficaremos felizes em ajudar.",
+    },
+}
@@ -0,0 +1,76 @@
+"""
+Treino offline do classificador local.
+
+Uso (dentro de backend/):
+    python train.py              # grava em models/nlp-v<MODEL_VERSION>.joblib
+    python train.py --out x.joblib
+    python train.py --backend hashing --data arquivo.jsonl --chunk-size 10000
+
+--data (só no backend hashing) é um JSONL com {"text": ..., "label": ...} por
+linha, lido em blocos via partial_fit sem carregar o arquivo inteiro.
+
+O limiar da cascata (USE_CASCADE=1) é calibrado aqui e gravado no artefato: a
+confiança abaixo da qual fica --escalation-rate dos textos de --calibration
+(JSONL com "text", ou um texto por linha; padrão: as correções reais de
+/api/feedback em FEEDBACK_PATH, se existirem). Sem textos de calibração vale
+DEFAULT_CASCADE_THRESHOLD até a primeira revisão do feedback, que recalibra.
+Nos mesmos textos sai a confiança de saída antecipada do chunking.py: a que só
+--early-exit-rate deles atinge.
+
+Revisões treinadas com as correções de /api/feedback (feedback.py) são
+publicadas por um ponteiro em models/current-*.json, que tem precedência sobre
+o artefato base: apague o ponteiro para voltar ao modelo gravado aqui.
+"""
+import argparse
+import json
+
+import os
+
+import nlp
+from feedback import FEEDBACK_PATH
+from nlp import MODEL_BACKEND, MODEL_VERSION, default_model_path, save_model, train_model
+
+
+def calibration_texts(path: str = None):
+    if path is None:
+        if not os.path.exists(FEEDBACK_PATH):
+            return []
+        path = FEEDBACK_PATH
+    with open(path, encoding="utf-8") as fh:
+        lines = [line.strip() for line in fh if line.strip()]
+    return [json.loads(line)["text"] if line.startswith("{") else line for line in lines]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina e grava o artefato do modelo local.")
+    parser.add_argument("--backend", default=MODEL_BACKEND, choices=["tfidf", "hashing"])
+    parser.add_argument("--out", default=None, help="caminho do artefato (.joblib)")
+    parser.add_argument("--data", default=None, help="JSONL rotulado para treino out-of-core (hashing)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--calibration", default=None,
+                        help="textos reais para calibrar o limiar da cascata (padrão: FEEDBACK_PATH)")
+    parser.add_argument("--escalation-rate", type=float, default=nlp.DEFAULT_ESCALATION_RATE,
+                        help="fração dos textos de calibração que a cascata envia à HF")
+    parser.add_argument("--early-exit-rate", type=float, default=nlp.DEFAULT_EARLY_EXIT_RATE,
+                        help="fração mais confiante dos textos que encerra um documento longo cedo")
+    args = parser.parse_args()
+
+    if args.data:
+        if args.backend != "hashing":
+            parser.error("--data requer --backend hashing")
+        nlp.PT_STOPWORDS = nlp.load_stopwords()
+        pipeline = nlp.train_hashing_model(nlp.iter_labeled_chunks(args.data, args.chunk_size))
+    else:
+        pipeline = train_model(args.backend)
+
+    out = args.out or (nlp.MODEL_PATH if args.backend == MODEL_BACKEND else default_model_path(args.backend))
+    calibration = nlp.calibrate(
+        pipeline, calibration_texts(args.calibration), args.escalation_rate, args.early_exit_rate,
+    )
+    path = save_model(pipeline, out, args.backend, calibration=calibration)
+    threshold = calibration.get("cascade_threshold", f"{nlp.DEFAULT_CASCADE_THRESHOLD} (padrão, sem textos)")
+    print(f"modelo {args.backend} v{MODEL_VERSION} gravado em {path} (limiar da cascata {threshold})")
+
+
+if __name__ == "__main__":
+    main()
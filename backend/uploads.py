@@ -0,0 +1,91 @@
+import codecs
+import os
+
+from fastapi import HTTPException
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# --------- Config limites de upload ----------
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_BYTES", str(20 * 1024 * 1024)))  # por arquivo
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(50 * 1024 * 1024)))  # por requisição
+MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "20000"))  # caracteres entregues ao modelo
+PROCESS_MAX_FILES = int(os.getenv("PROCESS_MAX_FILES", "50"))  # arquivos por requisição em /api/process
+
+READ_CHUNK = 64 * 1024
+
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Requisição maior que o limite de {limit} bytes.")
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """
+    MultiPartParser do Starlette com orçamento de bytes aplicado durante o
+    streaming: ao passar de max_request_bytes a requisição é abortada (413);
+    um arquivo que passa de max_file_bytes para de ser gravado e é marcado com
+    upload.oversized = True, sem afetar os demais.
+    """
+
+    def __init__(self, headers, stream, *, max_file_bytes: int, max_request_bytes: int, **kwargs):
+        super().__init__(headers, stream, **kwargs)
+        self.max_file_bytes = max_file_bytes
+        self.max_request_bytes = max_request_bytes
+        self._received = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        size = end - start
+        self._received += size
+        if self.max_request_bytes and self._received > self.max_request_bytes:
+            raise RequestTooLarge(self.max_request_bytes)
+
+        part = self._current_part
+        if part.file is not None and self.max_file_bytes:
+            part.bytes_seen = getattr(part, "bytes_seen", 0) + size
+            if part.bytes_seen > self.max_file_bytes:
+                part.file.oversized = True
+                return  # descarta o restante da parte
+        super().on_part_data(data, start, end)
+
+
+async def parse_form(request, *, max_files: int = 1000, max_file_bytes: int = MAX_FILE_BYTES,
+                     max_request_bytes: int = MAX_REQUEST_BYTES):
+    """
+    request.form() com limites. Content-Length acima do orçamento é recusado
+    antes de ler o corpo; o resto é contado enquanto chega.
+    """
+    content_length = request.headers.get("content-length")
+    if max_request_bytes and content_length and content_length.isdigit() \
+            and int(content_length) > max_request_bytes:
+        raise RequestTooLarge(max_request_bytes)
+
+    content_type = (request.headers.get("content-type") or "").lower()
+    if not content_type.startswith("multipart/form-data"):
+        return await request.form()
+
+    parser = LimitedMultiPartParser(
+        request.headers, request.stream(),
+        max_file_bytes=max_file_bytes, max_request_bytes=max_request_bytes, max_files=max_files,
+    )
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+async def read_text_upload(file, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """
+    Decodifica o upload em blocos com um decoder incremental (UTF-8, bytes
+    inválidos ignorados) e para ao juntar max_chars caracteres: nunca
+    materializa o arquivo inteiro em bytes nem em str.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts, total = [], 0
+    while total < max_chars:
+        chunk = await file.read(READ_CHUNK)
+        if not chunk:
+            parts.append(decoder.decode(b"", final=True))
+            break
+        text = decoder.decode(chunk)
+        parts.append(text)
+        total += len(text)
+    return "".join(parts)[:max_chars]
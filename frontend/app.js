@@ -87,6 +87,12 @@ form.addEventListener('submit', async (e) => {
       body: formData
     });
 
+    if (res.status === 429) {
+      const wait = res.headers.get('Retry-After') || 'alguns';
+      resultsDiv.innerHTML = `<p>Servidor ocupado no momento. Tente novamente em ${wait} segundo(s).</p>`;
+      return;
+    }
+
     if (!res.ok) {
       const errBody = await res.text().catch(() => 'Erro desconhecido');
       console.error('Erro HTTP', res.status, errBody);